@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Records real feed payloads once, then replays them offline through
+parse -> keyword match -> DB dedup -> clustering -> digest rendering and
+reports time, entries/second and peak memory for each stage.
+
+Usage:
+    python bench_pipeline.py record                      # download RSS_FEEDS into bench_fixtures/
+    python bench_pipeline.py run                         # replay fixtures, save JSON results
+    python bench_pipeline.py run --scale 100 --keyword-scale 5
+    python bench_pipeline.py run --scale 100 --processes 16   # parse+match on 16 worker processes
+    python bench_pipeline.py compare OLD.json NEW.json   # stage-by-stage comparison
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import defence_news_monitor as monitor
+
+FIXTURES_DIR = 'bench_fixtures'
+RESULTS_DIR = 'bench_results'
+
+def record(fixtures_dir: str):
+    """Download every feed in RSS_FEEDS to disk, with a manifest for replay"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    manifest = []
+    for i, (source, url) in enumerate(monitor.RSS_FEEDS.items()):
+        print(f"Recording {source}...")
+        try:
+            data, headers = monitor.download_feed(url)
+        except Exception as e:
+            print(f"  Skipped: {e}")
+            continue
+        filename = f"feed{i:02d}.xml"
+        with open(os.path.join(fixtures_dir, filename), 'wb') as f:
+            f.write(data)
+        manifest.append({'source': source, 'url': url, 'file': filename,
+                         'content_type': headers.get('content-type', '')})
+        print(f"  {len(data):,} bytes")
+    with open(os.path.join(fixtures_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\n✓ Recorded {len(manifest)} feeds to {fixtures_dir}/")
+
+def load_fixtures(fixtures_dir: str):
+    with open(os.path.join(fixtures_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    for item in manifest:
+        with open(os.path.join(fixtures_dir, item['file']), 'rb') as f:
+            item['data'] = f.read()
+    return manifest
+
+def synthetic_keywords(count: int) -> list:
+    """Extra keywords that look like real ones but rarely match"""
+    rng = random.Random(count)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [" ".join("".join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+                     for _ in range(rng.randint(1, 3))) for _ in range(count)]
+
+def copy_entry(entry: dict, copy: int) -> dict:
+    """Link and GUID for the `copy`th replica of an entry (a query parameter, which dedup keeps)"""
+    link = entry['link']
+    return {'link': f"{link}{'&' if '?' in link else '?'}copy={copy}",
+            'guid': f"copy{copy}:{entry['guid']}" if entry.get('guid') else ''}
+
+class Stage:
+    """Times one stage and records its peak traced memory"""
+
+    def __init__(self, results: dict, name: str, trace_memory: bool):
+        self.results = results
+        self.name = name
+        self.trace_memory = trace_memory
+        self.items = 0
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        result = {
+            'seconds': round(seconds, 4),
+            'items': self.items,
+            'items_per_s': round(self.items / seconds, 1) if seconds else None,
+        }
+        if self.trace_memory:
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        self.results[self.name] = result
+        return False
+
+def parse_in_processes(fixtures: list, args, stages: dict) -> list:
+    """Parse and match every fixture copy on the PARSE_PROCESSES pool, as one 'parse_match' stage"""
+    pool = monitor.get_parse_pool(args.processes)
+    # Start the workers outside the timed stage
+    list(pool.map(abs, range(args.processes)))
+    with Stage(stages, 'parse_match', not args.no_memory) as stage:
+        monitor.METRICS.reset()
+        futures = [(item['source'], copy, pool.submit(monitor._parse_task, item['source'], item['data'],
+                                                      {'content-type': item['content_type']}))
+                   for item in fixtures for copy in range(args.scale)]
+        candidates = []
+        for source, copy, future in futures:
+            feed_candidates = monitor._expand_candidates(source, future.result())
+            if copy:
+                # Unique links, GUIDs and IDs so later stages see distinct articles
+                for c in feed_candidates:
+                    c.update(copy_entry(c, copy))
+                    c['id'] = monitor.get_article_hash(c['title'], c['link'])
+            candidates.append(feed_candidates)
+        stage.items = int(monitor.METRICS.total('entries_parsed'))
+    return candidates
+
+def run(args) -> dict:
+    """Replay fixtures through every pipeline stage"""
+    fixtures = load_fixtures(args.fixtures)
+    if args.keyword_scale > 1:
+        monitor.KEYWORDS = monitor.KEYWORDS + synthetic_keywords(len(monitor.KEYWORDS) * (args.keyword_scale - 1))
+    monitor.KEYWORD_MATCHER = args.matcher
+    stages = {}
+    if not args.no_memory:
+        tracemalloc.start()
+
+    if args.processes:
+        candidates = parse_in_processes(fixtures, args, stages)
+    else:
+        with Stage(stages, 'parse', not args.no_memory) as stage:
+            parsed = []
+            for item in fixtures:
+                headers = {'content-type': item['content_type']}
+                for copy in range(args.scale):
+                    entries = monitor.parse_entries(item['data'], headers)
+                    if copy:
+                        # Unique links and GUIDs so later stages see distinct articles
+                        entries = [dict(e, **copy_entry(e, copy)) for e in entries]
+                    parsed.append((item['source'], entries))
+                    stage.items += len(entries)
+
+        with Stage(stages, 'match', not args.no_memory) as stage:
+            candidates = []
+            for source, entries in parsed:
+                candidates.append(monitor.match_entries(source, entries))
+                stage.items += len(entries)
+        del parsed
+    matched = sum(len(c) for c in candidates)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monitor.DB_PATH = os.path.join(tmp, 'bench.db')
+        monitor.init_db()
+
+        with Stage(stages, 'dedup', not args.no_memory) as stage:
+            articles = []
+            for feed_candidates in candidates:
+                articles.extend(monitor.store_new_articles(feed_candidates))
+                stage.items += len(feed_candidates)
+        del candidates
+
+        with Stage(stages, 'cluster', not args.no_memory) as stage:
+            stage.items = len(articles)
+            articles = monitor.cluster_articles(articles)
+
+        monitor.close_db()
+
+    with Stage(stages, 'render', not args.no_memory) as stage:
+        stage.items = len(articles)
+        html = monitor.generate_html_digest(articles)
+
+    if not args.no_memory:
+        tracemalloc.stop()
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'params': {'scale': args.scale, 'keyword_scale': args.keyword_scale,
+                   'keywords': len(monitor.KEYWORDS), 'matcher': args.matcher, 'feeds': len(fixtures),
+                   'processes': args.processes},
+        'totals': {
+            'entries': stages['parse_match' if args.processes else 'parse']['items'],
+            'matched': matched,
+            'digest_articles': len(articles),
+            'digest_bytes': len(html.encode()),
+            'seconds': round(sum(stage['seconds'] for stage in stages.values()), 4),
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        'stages': stages,
+    }
+
+def print_result(result: dict):
+    print(f"\n{'stage':<12}{'seconds':>10}{'items':>10}{'items/s':>12}{'peak MB':>10}")
+    for name, stage in result['stages'].items():
+        print(f"{name:<12}{stage['seconds']:>10}{stage['items']:>10}{stage['items_per_s'] or 0:>12}"
+              f"{stage.get('peak_mb', ''):>10}")
+    totals = result['totals']
+    print(f"\n{totals['entries']:,} entries, {totals['matched']:,} matched, "
+          f"{totals['digest_articles']:,} in digest, {totals['seconds']}s total, "
+          f"max RSS {totals['max_rss_mb']} MB")
+
+def compare(old_path: str, new_path: str):
+    """Print per-stage time ratios between two saved results"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{'stage':<12}{'old s':>10}{'new s':>10}{'change':>10}")
+    for name in new['stages']:
+        if name not in old['stages']:
+            continue
+        a, b = old['stages'][name]['seconds'], new['stages'][name]['seconds']
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{name:<12}{a:>10}{b:>10}{change:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feed processing pipeline offline")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('record', help="download RSS_FEEDS payloads to disk")
+    p.add_argument('--fixtures', default=FIXTURES_DIR)
+
+    p = sub.add_parser('run', help="replay recorded payloads through the pipeline")
+    p.add_argument('--fixtures', default=FIXTURES_DIR)
+    p.add_argument('--scale', type=int, default=1, help="replicate every feed's entries N times (e.g. 10-1000)")
+    p.add_argument('--keyword-scale', type=int, default=1, help="multiply the keyword list N times")
+    p.add_argument('--matcher', default='compiled', choices=['compiled', 'legacy'])
+    p.add_argument('--processes', type=int, default=0,
+                   help="parse and match on N worker processes (PARSE_PROCESSES) instead of inline")
+    p.add_argument('--no-memory', action='store_true', help="skip tracemalloc (faster, no peak memory)")
+    p.add_argument('--json', help="results file (default bench_results/pipeline-<timestamp>.json)")
+
+    p = sub.add_parser('compare', help="compare two saved results")
+    p.add_argument('old')
+    p.add_argument('new')
+
+    args = parser.parse_args()
+    if args.command != 'compare':
+        monitor.ensure_monitor_config()
+    if args.command == 'record':
+        record(args.fixtures)
+    elif args.command == 'compare':
+        compare(args.old, args.new)
+    else:
+        result = run(args)
+        print_result(result)
+        path = args.json or os.path.join(
+            RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✓ Results saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Seen-Key Index Benchmark
+Measures memory and lookup latency of the in-memory dedup index (SeenIndex)
+for large article histories, e.g. 1M and 10M stored dedup keys.
+
+Usage:
+    python bench_seen_index.py                          # 1M and 10M, both modes
+    python bench_seen_index.py --sizes 1000000 --modes bloom --sqlite
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from defence_news_monitor import SeenIndex
+
+LOOKUPS = 100000
+
+def random_ids(count: int, rng: random.Random):
+    """Yield signed 64-bit dedup keys (as article_keys)"""
+    for _ in range(count):
+        yield rng.getrandbits(64) - (1 << 63)
+
+def bench_index(mode: str, size: int) -> dict:
+    """Build an index of `size` IDs and time lookups of present and absent IDs"""
+    start = time.perf_counter()
+    index = SeenIndex(mode, capacity=size)
+    for article_id in random_ids(size, random.Random(f"stored-{size}")):
+        index.add(article_id)
+    build_s = time.perf_counter() - start
+    memory = index.memory_bytes()
+
+    sample = list(random_ids(min(size, LOOKUPS), random.Random(f"stored-{size}")))
+    absent = list(random_ids(LOOKUPS, random.Random(f"absent-{size}")))
+    start = time.perf_counter()
+    hits = sum(1 for article_id in sample if article_id in index)
+    hit_us = (time.perf_counter() - start) / len(sample) * 1e6
+    start = time.perf_counter()
+    false_positives = sum(1 for article_id in absent if article_id in index)
+    miss_us = (time.perf_counter() - start) / len(absent) * 1e6
+    assert hits == len(sample), "index lost an ID"
+
+    return {
+        'mode': mode,
+        'size': size,
+        'build_s': round(build_s, 2),
+        'memory_mb': round(memory / 1e6, 1),
+        'bytes_per_id': round(memory / size, 1),
+        'hit_us': round(hit_us, 2),
+        'miss_us': round(miss_us, 2),
+        'false_positive_rate': round(false_positives / len(absent), 4),
+    }
+
+def bench_sqlite(size: int) -> dict:
+    """Baseline: the same lookups as single-row primary key queries against SQLite"""
+    rng = random.Random(f"stored-{size}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE seen_keys (key INTEGER PRIMARY KEY) WITHOUT ROWID")
+        start = time.perf_counter()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO seen_keys VALUES (?)", ((i,) for i in random_ids(size, rng)))
+        build_s = time.perf_counter() - start
+        sample = [row[0] for row in conn.execute("SELECT key FROM seen_keys LIMIT ?", (LOOKUPS,))]
+        absent = list(random_ids(LOOKUPS, random.Random(f"absent-{size}")))
+        timings = []
+        for ids in (sample, absent):
+            start = time.perf_counter()
+            for article_id in ids:
+                conn.execute("SELECT 1 FROM seen_keys WHERE key = ?", (article_id,)).fetchone()
+            timings.append((time.perf_counter() - start) / len(ids) * 1e6)
+        conn.close()
+        file_size = os.path.getsize(path)
+
+    return {
+        'mode': 'sqlite',
+        'size': size,
+        'build_s': round(build_s, 2),
+        'memory_mb': round(file_size / 1e6, 1),  # on disk
+        'bytes_per_id': round(file_size / size, 1),
+        'hit_us': round(timings[0], 2),
+        'miss_us': round(timings[1], 2),
+        'false_positive_rate': 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory seen-key index")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000])
+    parser.add_argument('--modes', nargs='+', default=['bloom', 'set'], choices=['bloom', 'set'])
+    parser.add_argument('--sqlite', action='store_true', help="also time plain SQLite lookups")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'mode':<8}{'size':>12}{'build s':>10}{'MB':>10}{'B/id':>8}{'hit us':>9}{'miss us':>9}{'FP rate':>9}")
+    for size in args.sizes:
+        runs = [lambda mode=mode: bench_index(mode, size) for mode in args.modes]
+        if args.sqlite:
+            runs.append(lambda: bench_sqlite(size))
+        for run in runs:
+            r = run()
+            results.append(r)
+            print(f"{r['mode']:<8}{r['size']:>12,}{r['build_s']:>10}{r['memory_mb']:>10}{r['bytes_per_id']:>8}"
+                  f"{r['hit_us']:>9}{r['miss_us']:>9}{r['false_positive_rate']:>9}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures how long `import defence_news_monitor` takes (python -X importtime)
+and how long short CLI invocations take end to end, and fails when the
+import exceeds a time budget or pulls in modules that only fetching or
+sending need.
+
+Usage:
+    python bench_startup.py                     # median of 5 runs, 60 ms import budget
+    python bench_startup.py --budget-ms 30 --runs 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULE = 'defence_news_monitor'
+SCRIPT = 'defence_news_monitor.py'
+
+# Must stay out of the module import (loaded only by fetch / send / import paths)
+LAZY_MODULES = ['feedparser', 'smtplib', 'email.mime.multipart', 'email.mime.text', 'ssl',
+                'urllib.request', 'concurrent.futures', 'xml.etree.ElementTree', 'gzip']
+
+def import_profile() -> tuple:
+    """(cumulative import time of MODULE in ms, {module: cumulative us}) from one -X importtime run"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|').split('|'))
+        modules[name] = int(cumulative_us)
+    return modules[MODULE] / 1000, modules
+
+def loaded_lazy_modules() -> list:
+    code = (f"import sys, {MODULE}; "
+            f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def wall_ms(command: list) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark defence_news_monitor startup time")
+    parser.add_argument('--runs', type=int, default=5, help="runs per measurement (median is reported)")
+    parser.add_argument('--budget-ms', type=float, default=60, help="fail if the module import takes longer")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # Warm up (bytecode cache, disk cache)
+    import_profile()
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(ms for ms, _ in profiles)
+    slowest = sorted(profiles[-1][1].items(), key=lambda item: -item[1])
+
+    commands = {
+        'python (empty)': [sys.executable, '-c', 'pass'],
+        f'{SCRIPT} --help': [sys.executable, SCRIPT, '--help'],
+        f'-m {MODULE} --help': [sys.executable, '-m', MODULE, '--help'],
+    }
+    walls = {name: statistics.median(wall_ms(command) for _ in range(args.runs))
+             for name, command in commands.items()}
+
+    print(f"import {MODULE}: {import_ms:.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("\nSlowest imports (cumulative ms):")
+    for name, cumulative_us in slowest[1:11]:
+        print(f"  {name:<40}{cumulative_us / 1000:>8.1f}")
+    print("\nWall time (ms):")
+    for name, ms in walls.items():
+        print(f"  {name:<40}{ms:>8.1f}")
+
+    lazy = loaded_lazy_modules()
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    if lazy:
+        failures.append(f"imported at module load: {', '.join(lazy)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'import_ms': round(import_ms, 2), 'budget_ms': args.budget_ms,
+                       'wall_ms': {name: round(ms, 1) for name, ms in walls.items()},
+                       'eager_lazy_modules': lazy}, f, indent=2)
+        print(f"\n✓ Results saved to {args.json}")
+
+    if failures:
+        for failure in failures:
+            print(f"\n✗ {failure}")
+        sys.exit(1)
+    print("\n✓ Startup within budget")
+
+if __name__ == "__main__":
+    main()
@@ -4,166 +4,1091 @@ Defence & Security News Aggregator
 Monitors multiple RSS feeds, filters by keywords, tracks deltas, sends email digest
 """
 
-import feedparser
+import argparse
 import sqlite3
 import hashlib
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+import heapq
+import io
+import json
+import zlib
+from array import array
+import random
+import signal
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from urllib.parse import urljoin, urlsplit
+import math
 import os
 import re
-from typing import List, Dict, Set
+import sys
+from typing import List, Dict, Set, Tuple, Optional, Iterator, TextIO
 import time
 
-# RSS Feed Sources
-RSS_FEEDS = {
-    "Defense News": "https://www.defensenews.com/arc/outboundfeeds/rss/",
-    "Breaking Defense": "https://breakingdefense.com/feed/",
-    "C4ISRNET": "https://www.c4isrnet.com/arc/outboundfeeds/rss/",
-    "The War Zone": "https://www.thedrive.com/the-war-zone/rss",
-    "RUSI": "https://rusi.org/rss.xml",
-    "IISS": "https://www.iiss.org/news-insights/rss/",
-    "Gov.uk MOD": "https://www.gov.uk/government/organisations/ministry-of-defence.atom",
-    "Gov.uk News": "https://www.gov.uk/search/news-and-communications.atom",
-    "Gov.uk Home Office": "https://www.gov.uk/government/organisations/home-office.atom",
-    "UK Strategic Command": "https://www.gov.uk/government/organisations/strategic-command.atom",
-    "US DoD": "https://www.defense.gov/DesktopModules/ArticleCS/RSS.ashx?ContentType=1&Site=945",
-    "US DoD Contracts": "https://www.defense.gov/DesktopModules/ArticleCS/RSS.ashx?ContentType=1&Site=3",
-    "NATO": "https://www.nato.int/cps/en/natohq/news.rss",
-}
+# feedparser, urllib.request/ssl, concurrent.futures, xml.etree, gzip, smtplib
+# and email are imported by the functions that use them, so that commands
+# like `search`, `stats` or `render` start without loading them
 
-# Keyword filters (case-insensitive matching)
-KEYWORDS = [
-    # Primary keywords
-    "ISR", "electronic warfare", "procurement", "Digital Targeting Web", "DTW",
-    "CEMA", "Digital Secure Access", "Cyber", "Data", "Data Integration",
-    "Digital Twin", "Simulation", "Synthetic data", "Drone", "PNT",
-    
-    # === CACI Specific ===
-    "CACI", "CACI International", "CACI Ltd", "CACI UK",
-    "CACI contract", "awarded to CACI", "CACI win", "CACI framework",
-    "CACI acquisition", "CACI expansion", "CACI partnership",
-    "CACI data platform", "CACI analytics solution",
-    
-    # === Data & Analytics ===
-    "data analytics", "data fusion", "data management", "data integration",
-    "defence data platform", "battlefield data", 
-    "national security analytics", "intelligence modernisation",
-    
-    # === Digital Transformation ===
-    "digital services", "digital transformation", "digital twins",
-    "secure digital twin", "defence digital transformation",
-    "MoD digital transformation", "Home Office data modernisation",
-    "public sector digital", "defence digital service",
-    
-    # === AI & Machine Learning ===
-    "AI", "artificial intelligence", "machine learning",
-    "defence AI", "AI-enabled decision support", "national security AI",
-    "defence AI regulation", "AI assurance", "ethical AI", "AI arms race",
-    "data ethics",
-    
-    # === Command & Control ===
-    "joint all-domain command and control", "JADC2",
-    "mission systems", "command and control",
-    "multi-domain operations",
-    
-    # === Security & Resilience ===
-    "cyber security", "secure by design", "cyber resilience",
-    "data sovereignty", "cyber act",
-    
-    # === Geospatial ===
-    "geospatial data", "GIS", "mapping", "location intelligence",
-    
-    # === Emerging Technologies ===
-    "quantum", "edge computing", "space domain awareness",
-    "dual-use technology",
-    
-    # === Services & Capabilities ===
-    "defence consulting", "systems engineering", "enterprise architecture",
-    
-    # === Government Organizations & Programs ===
-    "NATO", "Ministry of Defence", "MoD", "Home Office",
-    "UK Strategic Command", "Data Strategy for Defence",
-    "NATO innovation fund", "Defence AI Centre", "DSTL",
-    "Crown Commercial Service", "CCS frameworks",
-    
-    # === Data Strategies ===
-    "MoD data strategy", "NATO data strategy",
-    
-    # === Procurement & Frameworks ===
-    "defence procurement", "framework", "contract award", "tender",
-    "defence procurement reform", "digital framework", "G-Cloud", "DSP",
-    "framework awards", "Digital Outcomes", "MOD D2N2",
-    "MOD contracts", "government framework award",
-    
-    # === International Partnerships ===
-    "AUKUS", "Five Eyes", "defence tech collaboration",
-    
-    # === Major Defence Contractors ===
-    "Palantir", "Anduril",
-    "BAE Systems", "QinetiQ", "Leonardo", "Thales", "Raytheon", "Babcock",
-    "CGI", "Leidos", "KBR", "Serco",
-    
-    # === Cloud Providers in Defence ===
-    "AWS Defence", "Microsoft Defence", "Google Cloud Defence",
-    
-    # === Policy & Budget ===
-    "defence budget", "MoD funding", "Integrated Review", "Strategic Defence Review",
-    "national security legislation", "defence innovation",
-    "sovereign capability", "trusted supplier", "defence supply chain",
-    
-    # === Geopolitical Signals ===
-    "Ukraine", "Indo-Pacific", "China", "Russia", "semiconductors",
-]
+# Feed sources and keyword filters live in monitor_config.json ("feeds" and
+# "keyword_groups"); loaded by the commands that fetch or match, and reloaded
+# by the daemon when it changes
+MONITOR_CONFIG = os.environ.get('MONITOR_CONFIG') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'monitor_config.json')
+
+RSS_FEEDS: Dict[str, str] = {}
+KEYWORD_GROUPS: Dict[str, List[str]] = {}
+KEYWORDS: List[str] = []  # all groups in file order (case-insensitive matching)
+
+def load_monitor_config(path: str = MONITOR_CONFIG) -> Dict:
+    """Feeds and keyword groups from the JSON config file"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    feeds = {str(name): str(url) for name, url in config['feeds'].items()}
+    groups = {str(name): [str(k) for k in keywords] for name, keywords in config['keyword_groups'].items()}
+    if not feeds:
+        raise ValueError(f"{path}: no feeds configured")
+    return {
+        'feeds': feeds,
+        'keyword_groups': groups,
+        # A keyword listed in several groups is matched (and reported) once
+        'keywords': list(dict.fromkeys(keyword for keywords in groups.values() for keyword in keywords)),
+    }
+
+def apply_monitor_config(config: Dict):
+    """Make a loaded config the current RSS_FEEDS / KEYWORD_GROUPS / KEYWORDS"""
+    global RSS_FEEDS, KEYWORD_GROUPS, KEYWORDS
+    RSS_FEEDS = config['feeds']
+    KEYWORD_GROUPS = config['keyword_groups']
+    KEYWORDS = config['keywords']
+
+def ensure_monitor_config():
+    """Load MONITOR_CONFIG on first use (importing the module or --help never reads it)"""
+    if not RSS_FEEDS:
+        apply_monitor_config(load_monitor_config())
+
+# Fetch settings (override via environment variables)
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', '6'))     # concurrent downloads
+PARSE_PROCESSES = int(os.environ.get('PARSE_PROCESSES', '0'))  # parse/match in N processes (0 = in the fetch threads)
+FEED_TIMEOUT = float(os.environ.get('FEED_TIMEOUT', '30'))    # seconds per feed
+FEED_CONNECT_TIMEOUT = float(os.environ.get('FEED_CONNECT_TIMEOUT', '10'))  # seconds to connect, and per read
+HOST_TIMEOUTS = os.environ.get('HOST_TIMEOUTS', '')  # per-host "host=connect/total,..." overrides (seconds)
+HOST_DELAY = float(os.environ.get('HOST_DELAY', '1.0'))       # seconds between requests to one host
+FETCH_RETRIES = int(os.environ.get('FETCH_RETRIES', '2'))      # retries of a failed download, after the first try
+FETCH_BACKOFF = float(os.environ.get('FETCH_BACKOFF', '2'))    # seconds before the first retry, doubling
+FETCH_BUDGET = float(os.environ.get('FETCH_BUDGET', '300'))    # seconds for all fetching in one run (0 = none)
+BREAKER_THRESHOLD = int(os.environ.get('BREAKER_THRESHOLD', '3'))  # failed runs in a row before a feed is skipped
+BREAKER_COOLDOWN_RUNS = int(os.environ.get('BREAKER_COOLDOWN_RUNS', '1'))  # runs (daemon: polls) first skipped, doubling
+BREAKER_MAX_SKIP_RUNS = int(os.environ.get('BREAKER_MAX_SKIP_RUNS', '8'))  # most runs skipped in a row
+USER_AGENT = "DefenceNewsMonitor/1.0 (+https://github.com/MarieThirlwall/thyrel-DefenceMonitor)"
 
 # Database setup
 DB_PATH = "defence_news.db"
 
+# Run metrics output: JSON lines appended per run and a Prometheus textfile (empty = off)
+METRICS_JSONL = os.environ.get('METRICS_JSONL', 'run_metrics.jsonl')
+METRICS_PROM = os.environ.get('METRICS_PROM', 'run_metrics.prom')
+PROFILE = os.environ.get('PROFILE', '')  # 'cprofile' or 'tracemalloc'
+
+class Metrics:
+    """Thread-safe counters and stage timers for one run, optionally per feed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = Counter()       # (name, feed) -> value
+            self.timers = Counter()         # (stage, feed) -> seconds
+            self.started = time.time()
+
+    def incr(self, name: str, value: float = 1, feed: str = None):
+        with self._lock:
+            self.counters[(name, feed)] += value
+
+    @contextmanager
+    def timer(self, stage: str, feed: str = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timers[(stage, feed)] += elapsed
+
+    def merge(self, counters: Dict, timers: Dict):
+        """Add counters and timers recorded elsewhere (e.g. in a worker process)"""
+        with self._lock:
+            self.counters.update(counters)
+            self.timers.update(timers)
+
+    def total(self, name: str) -> float:
+        """Counter summed over all feeds"""
+        return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def stage_seconds(self, stage: str) -> float:
+        return sum(value for (key, _), value in self.timers.items() if key == stage)
+
+    def samples(self):
+        """(metric, labels, value) for every counter and timer"""
+        for (name, feed), value in sorted(self.counters.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            yield name, {'feed': feed} if feed else {}, value
+        for (stage, feed), seconds in sorted(self.timers.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            labels = {'stage': stage}
+            if feed:
+                labels['feed'] = feed
+            yield 'stage_seconds', labels, round(seconds, 6)
+
+    def write_jsonl(self, path: str):
+        """Append one JSON object per sample, all sharing the run timestamp"""
+        ts = datetime.fromtimestamp(self.started).isoformat(timespec='seconds')
+        with open(path, 'a', encoding='utf-8') as f:
+            for metric, labels, value in self.samples():
+                f.write(json.dumps({'ts': ts, 'metric': metric, **labels, 'value': value}, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path: str):
+        """Write the Prometheus text exposition format (for the node_exporter textfile collector)"""
+        lines = []
+        typed = set()
+        for metric, labels, value in self.samples():
+            name = f"defence_monitor_{metric}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            label_str = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+        lines.append(f"defence_monitor_last_run_timestamp_seconds {self.started:.0f}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+METRICS = Metrics()
+
+def write_metrics():
+    """Write run metrics to METRICS_JSONL / METRICS_PROM (failures are only reported)"""
+    try:
+        if METRICS_JSONL:
+            METRICS.write_jsonl(METRICS_JSONL)
+        if METRICS_PROM:
+            METRICS.write_prometheus(METRICS_PROM)
+    except OSError as e:
+        print(f"Note: Could not write metrics ({e})")
+
+@contextmanager
+def profiling(mode: str = PROFILE):
+    """Optional profiler around a run: PROFILE=cprofile or PROFILE=tracemalloc"""
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats('profile.pstats')
+            print("\n[PROFILE] top functions by cumulative time (full stats in profile.pstats)")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+    elif mode == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start(10)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"\n[PROFILE] peak traced memory: {peak / 1e6:.1f} MB; top allocation sites:")
+            for stat in snapshot.statistics('lineno')[:15]:
+                print(f"  {stat}")
+    else:
+        yield
+
+# Optional in-memory dedup front: 'off' (default), 'bloom' or 'set' (see SeenIndex)
+DEDUP_INDEX = os.environ.get('DEDUP_INDEX', 'off')
+
+# Retention: rows older than this are moved to monthly archive files, keeping only their ID
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '180'))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+VACUUM_INTERVAL_DAYS = int(os.environ.get('VACUUM_INTERVAL_DAYS', '30'))
+
+# Shared connection for the run; DB access stays on the main thread
+_db_conn = None
+_db_readonly = False
+SQL_CHUNK = 500  # max bound parameters per IN (...) query
+SCHEMA_VERSION = 2  # PRAGMA user_version written by init_db() once all migrations ran
+
+def get_db() -> sqlite3.Connection:
+    """Return the run's SQLite connection, opening it (WAL mode) on first use"""
+    global _db_conn
+    if _db_conn is None:
+        _db_conn = sqlite3.connect(DB_PATH)
+        _db_conn.execute("PRAGMA journal_mode=WAL")
+        _db_conn.execute("PRAGMA synchronous=NORMAL")
+        _db_conn.execute("PRAGMA temp_store=MEMORY")
+        _db_conn.execute("PRAGMA cache_size=-16000")  # 16 MB page cache
+        _db_conn.execute("PRAGMA busy_timeout=5000")
+    return _db_conn
+
+def open_db_readonly():
+    """Open the DB read-only for commands that only look at it (render, stats, search).
+
+    No migrations run and nothing is written. A missing DB, or one last
+    written by an older version, goes through init_db() once instead.
+    """
+    global _db_conn, _db_readonly
+    if _db_conn is None and os.path.exists(DB_PATH):
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        conn.execute("PRAGMA busy_timeout=5000")
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            _db_conn, _db_readonly = conn, True
+            return
+        conn.close()
+    init_db()
+
+def close_db():
+    """Checkpoint the WAL back into the main file and close the connection.
+
+    Must run before the DB file is copied or committed, otherwise recent
+    writes may still be sitting in defence_news.db-wal.
+    """
+    global _db_conn, _db_readonly
+    if _db_conn is not None:
+        if not _db_readonly:
+            _db_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        _db_conn.close()
+        _db_conn = None
+        _db_readonly = False
+
+def _add_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+    """Add columns missing from a table created by an older version"""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
 def init_db():
     """Initialize SQLite database for tracking seen articles"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     c = conn.cursor()
+    # Articles are deduplicated through seen_keys, so `id` (hex MD5 of title +
+    # link, kept for exports and archive files) needs no index of its own
     c.execute('''
         CREATE TABLE IF NOT EXISTS articles (
-            id TEXT PRIMARY KEY,
+            id TEXT,
             source TEXT,
             title TEXT,
             link TEXT,
             published TEXT,
             summary TEXT,
+            seen_date TEXT,
+            published_ts INTEGER
+        )
+    ''')
+    # `published` parsed to epoch seconds (UTC); NULL when the feed's date is unparseable
+    _add_columns(c, 'articles', {'published_ts': 'INTEGER'})  # see migrate_published_ts()
+    # HTTP validators and body hash per feed, for conditional GETs
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feed_cache (
+            feed_url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,
+            body_size INTEGER,
+            checked_date TEXT,
+            hwm_keys BLOB,
+            hwm_keywords TEXT
+        )
+    ''')
+    _add_columns(c, 'feed_cache', {'hwm_keys': 'BLOB', 'hwm_keywords': 'TEXT'})
+    # 64-bit dedup keys (canonical GUID / link, see article_keys) of every
+    # article ever stored, including rows since moved to the archive
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS seen_keys (
+            key INTEGER PRIMARY KEY
+        ) WITHOUT ROWID
+    ''')
+    # Consecutive download failures per feed; a feed sits out its next skip_runs runs
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feed_health (
+            feed_url TEXT PRIMARY KEY,
+            source TEXT,
+            failures INTEGER,
+            last_error TEXT,
+            last_failure TEXT,
+            last_success TEXT,
+            skip_runs INTEGER
+        )
+    ''')
+    # Small key/value store for maintenance state
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    # Matches waiting for the next digest (daemon mode), by article key
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS pending_digest (
+            key INTEGER UNIQUE,
+            payload TEXT,
+            queued_date TEXT
+        )
+    ''')
+    # MinHash signatures and LSH band buckets for near-duplicate clustering, by article key
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS article_signatures (
+            key INTEGER PRIMARY KEY,
+            signature BLOB,
             seen_date TEXT
         )
     ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            band INTEGER,
+            bucket INTEGER,
+            key INTEGER,
+            PRIMARY KEY (band, bucket, key)
+        ) WITHOUT ROWID
+    ''')
+    # Articles per day, source and keyword (keyword '' counts all articles), see update_rollup()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT,
+            source TEXT,
+            keyword TEXT,
+            hits INTEGER,
+            PRIMARY KEY (day, source, keyword)
+        ) WITHOUT ROWID
+    ''')
+    rebuilt = migrate_article_id_index()  # before the indexes, which it would drop
+    c.execute("CREATE INDEX IF NOT EXISTS idx_articles_seen_date ON articles (seen_date)")
+    # (source, published_ts) also serves lookups by source alone
+    c.execute("DROP INDEX IF EXISTS idx_articles_source")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_articles_source_published ON articles (source, published_ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_articles_published_ts ON articles (published_ts)")
     conn.commit()
-    conn.close()
+    migrate_seen_keys()
+    migrate_published_ts()
+    init_fts()
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    if rebuilt:
+        compact_db(force=True)  # give back the pages of the old table
 
 def get_article_hash(title: str, link: str) -> str:
     """Generate unique hash for article"""
     return hashlib.md5(f"{title}{link}".encode()).hexdigest()
 
-def is_article_seen(article_id: str) -> bool:
-    """Check if article has been seen before"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id FROM articles WHERE id = ?", (article_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def mark_article_seen(article_id: str, source: str, title: str, link: str, 
-                     published: str, summary: str):
-    """Mark article as seen in database"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        INSERT OR IGNORE INTO articles (id, source, title, link, published, summary, seen_date)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (article_id, source, title, link, published, summary, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+# Query parameters that only track where a click came from (utm_* is matched by prefix)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+                   'ref', 'ref_src', 'ref_url', 'cmpid', 'ocid', 'ito', '_ga', '_hsenc', '_hsmi'}
 
-def matches_keywords(text: str, keywords: List[str]) -> List[str]:
+def canonical_url(url: str) -> str:
+    """Normalise a link for dedup: https, lowercase host without www. or default
+    port, tracking parameters and fragment dropped, remaining query sorted and
+    no trailing slash. Anything that is not a URL is returned stripped."""
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = parts.hostname or ''
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    params = sorted(param for param in parts.query.split('&') if param and not (
+        (name := param.split('=', 1)[0].lower()) in TRACKING_PARAMS or name.startswith('utm_')))
+    path = parts.path.rstrip('/')
+    return f"{scheme}://{netloc}{path}" + (f"?{'&'.join(params)}" if params else "")
+
+def _key64(text: str) -> int:
+    """Signed 64-bit hash (fits an SQLite INTEGER)"""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big', signed=True)
+
+def article_keys(title: str, link: str, guid: str = '') -> List[int]:
+    """Dedup keys for an entry: its feed GUID and its canonical link.
+
+    A GUID that is a URL is canonicalised like a link (so a permalink GUID
+    and the link share one key); the title is only used when an entry has
+    neither. An entry is seen if any of its keys is.
+    """
+    keys = []
+    guid = (guid or '').strip()
+    if guid:
+        keys.append(_key64(f"link:{canonical_url(guid)}") if urlsplit(guid).scheme in ('http', 'https')
+                    else _key64(f"guid:{guid}"))
+    if link.strip():
+        key = _key64(f"link:{canonical_url(link)}")
+        if key not in keys:
+            keys.append(key)
+    if not keys:
+        keys.append(_key64(f"title:{' '.join(title.lower().split())}"))
+    return keys
+
+def legacy_key(article_id: str) -> int:
+    """Key for a pre-seen_keys article ID (hex MD5 of title + link), as kept for archived rows"""
+    return int.from_bytes(bytes.fromhex(article_id)[:8], 'big', signed=True)
+
+class SeenIndex:
+    """In-memory index of known dedup keys, consulted before the database.
+
+    'bloom' keeps a Bloom filter: no false negatives, so keys it rejects are
+    definitely new and only possible positives are confirmed in SQLite.
+    'set' keeps the exact set of 64-bit keys.
+    """
+
+    def __init__(self, mode: str = 'bloom', capacity: int = 100000, error_rate: float = 0.01):
+        if mode not in ('bloom', 'set'):
+            raise ValueError(f"Unknown dedup index mode: {mode}")
+        self.mode = mode
+        self.exact = mode == 'set'
+        self.count = 0
+        if self.exact:
+            self._keys = set()
+        else:
+            capacity = max(capacity, 1000)
+            self._bits_count = int(-capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+            self._hash_count = max(1, round(self._bits_count / capacity * math.log(2)))
+            self._bits = bytearray(self._bits_count // 8 + 1)
+
+    def _positions(self, key: int):
+        # Keys are already uniform hashes: use their two 32-bit halves
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) & 0xFFFFFFFF | 1
+        m = self._bits_count
+        return [(h1 + i * h2) % m for i in range(self._hash_count)]
+
+    def add(self, key: int):
+        self.count += 1
+        if self.exact:
+            self._keys.add(key)
+            return
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        if self.exact:
+            return key in self._keys
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index"""
+        if self.exact:
+            return sys.getsizeof(self._keys) + len(self._keys) * sys.getsizeof(1 << 62)
+        return sys.getsizeof(self._bits)
+
+_seen_index = None
+
+def load_seen_index(mode: str = DEDUP_INDEX) -> Optional[SeenIndex]:
+    """Load every known dedup key into the in-memory dedup index (if enabled)"""
+    global _seen_index
+    if mode == 'off':
+        _seen_index = None
+        return None
+    conn = get_db()
+    count = conn.execute("SELECT COUNT(*) FROM seen_keys").fetchone()[0]
+    index = SeenIndex(mode, capacity=max(count * 2, 100000))
+    for (key,) in conn.execute("SELECT key FROM seen_keys"):
+        index.add(key)
+    _seen_index = index
+    print(f"Loaded {index.count:,} seen keys into {mode} dedup index ({index.memory_bytes() / 1e6:.1f} MB)")
+    return index
+
+def find_seen_keys(keys: Iterator[int]) -> Set[int]:
+    """Return the subset of dedup keys already in the database (bulk IN queries).
+
+    With a dedup index loaded, keys the index rules out never reach SQLite.
+    """
+    keys = list(keys)
+    if _seen_index is not None:
+        keys = [key for key in keys if key in _seen_index]
+        METRICS.incr('dedup_index_positives', len(keys))
+        if _seen_index.exact:
+            return set(keys)
+
+    conn = get_db()
+    seen = set()
+    for i in range(0, len(keys), SQL_CHUNK):
+        chunk = keys[i:i + SQL_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        seen.update(row[0] for row in conn.execute(
+            f"SELECT key FROM seen_keys WHERE key IN ({placeholders})", chunk))
+    return seen
+
+def published_timestamp(published: str) -> Optional[int]:
+    """Feed date string as epoch seconds, None if unparseable"""
+    parsed = parse_published(published)
+    return int(parsed.timestamp()) if parsed else None
+
+def mark_articles_seen(rows: List[Tuple], keys: List[int]):
+    """Insert (id, source, title, link, published, summary) rows and their dedup keys in one transaction.
+
+    Rows are not checked against seen_keys here; see store_new_articles.
+    """
+    seen_date = datetime.now().isoformat()
+    with get_db() as conn:
+        conn.executemany('''
+            INSERT INTO articles (id, source, title, link, published, summary, seen_date, published_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (seen_date, published_timestamp(row[4])) for row in rows])
+        conn.executemany("INSERT OR IGNORE INTO seen_keys (key) VALUES (?)", [(key,) for key in keys])
+    if _seen_index is not None:
+        for key in keys:
+            _seen_index.add(key)
+
+def migrate_article_id_index() -> bool:
+    """One-off: rebuild articles without the TEXT primary key on `id` and its
+    index, which seen_keys made redundant. Rowids are kept, so the FTS index
+    stays valid."""
+    conn = get_db()
+    if not any(origin == 'pk' for _, _, _, origin, _ in conn.execute("PRAGMA index_list(articles)")):
+        return False
+    columns = 'id, source, title, link, published, summary, seen_date, published_ts'
+    with conn:
+        conn.execute("DROP VIEW IF EXISTS known_ids")
+        conn.execute("DROP TABLE IF EXISTS articles_rebuilt")
+        conn.execute('''
+            CREATE TABLE articles_rebuilt (
+                id TEXT,
+                source TEXT,
+                title TEXT,
+                link TEXT,
+                published TEXT,
+                summary TEXT,
+                seen_date TEXT,
+                published_ts INTEGER
+            )
+        ''')
+        conn.execute(f"INSERT INTO articles_rebuilt (rowid, {columns}) SELECT rowid, {columns} FROM articles")
+        conn.execute("DROP TABLE articles")  # and its FTS triggers, which init_fts() recreates
+        conn.execute("ALTER TABLE articles_rebuilt RENAME TO articles")
+    print("Dropped the redundant index on article IDs")
+    return True
+
+def migrate_seen_keys():
+    """One-off upgrade from hex article IDs: key every stored article and fold
+    archived_ids (whose titles and links are only in the archive files) into
+    seen_keys as legacy keys, then drop the old table and view."""
+    conn = get_db()
+    if get_meta('seen_keys_version') == '1':
+        return
+    has_archived = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archived_ids'").fetchone()
+    with conn:
+        cursor = conn.execute("SELECT title, link FROM articles")
+        articles = 0
+        for rows in _batched(cursor, SQL_CHUNK):
+            articles += len(rows)
+            conn.executemany("INSERT OR IGNORE INTO seen_keys (key) VALUES (?)",
+                             [(key,) for title, link in rows for key in article_keys(title or '', link or '')])
+        archived = 0
+        if has_archived:
+            for rows in _batched(conn.execute("SELECT id FROM archived_ids"), SQL_CHUNK):
+                archived += len(rows)
+                conn.executemany("INSERT OR IGNORE INTO seen_keys (key) VALUES (?)",
+                                 [(legacy_key(article_id),) for (article_id,) in rows])
+        conn.execute("DROP VIEW IF EXISTS known_ids")
+        conn.execute("DROP TABLE IF EXISTS archived_ids")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seen_keys_version', '1')")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seen_keys_legacy', ?)", (str(archived),))
+    if articles or archived:
+        print(f"Migrated {articles} articles and {archived} archived IDs to seen_keys")
+
+def migrate_published_ts():
+    """One-off: fill published_ts for rows stored before the column existed"""
+    conn = get_db()
+    if get_meta('published_ts_version') == '1':
+        return
+    # Replace the FTS update trigger (older databases fire it on any column) so
+    # the backfill does not reindex every row; init_fts() recreates it
+    conn.execute("DROP TRIGGER IF EXISTS articles_fts_update")
+    with conn:
+        cursor = conn.execute("SELECT rowid, published FROM articles WHERE published_ts IS NULL")
+        updated = 0
+        for rows in _batched(cursor, SQL_CHUNK):
+            updated += len(rows)
+            conn.executemany("UPDATE articles SET published_ts = ? WHERE rowid = ?",
+                             [(published_timestamp(published or ''), rowid) for rowid, published in rows])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('published_ts_version', '1')")
+    if updated:
+        print(f"Parsed published dates of {updated} articles")
+
+def load_feed_cache() -> Dict[str, Dict]:
+    """Load cached validators for every feed, keyed by feed URL"""
+    cursor = get_db().execute("SELECT * FROM feed_cache")
+    columns = [d[0] for d in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor}
+
+HWM_COLUMNS = ('hwm_keys', 'hwm_keywords')  # see EntryMark
+
+def save_feed_cache(entry: Dict):
+    """Store validators and the entry high-water mark for a feed after its entries have been processed"""
+    with get_db() as conn:
+        conn.execute(f'''
+            INSERT OR REPLACE INTO feed_cache (feed_url, etag, last_modified, body_hash, body_size, checked_date,
+                                               {', '.join(HWM_COLUMNS)})
+            VALUES ({', '.join('?' * (6 + len(HWM_COLUMNS)))})
+        ''', (entry['feed_url'], entry.get('etag'), entry.get('last_modified'), entry.get('body_hash'),
+              entry.get('body_size'), datetime.now().isoformat()) + tuple(entry.get(c) for c in HWM_COLUMNS))
+
+def load_feed_health() -> Dict[str, Dict]:
+    """Circuit breaker state for every feed that has been fetched, keyed by feed URL"""
+    cursor = get_db().execute("SELECT * FROM feed_health")
+    columns = [d[0] for d in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor}
+
+def breaker_open(health: Dict = None) -> bool:
+    """True while a feed's circuit breaker says to skip it"""
+    return bool(health and health['skip_runs'])
+
+def skip_feed_run(feed_url: str):
+    """Count down one skipped run of a feed whose breaker is open"""
+    with get_db() as conn:
+        conn.execute("UPDATE feed_health SET skip_runs = skip_runs - 1 WHERE feed_url = ? AND skip_runs > 0",
+                     (feed_url,))
+
+def record_feed_health(feed_url: str, source: str, error: str = None, previous: Dict = None):
+    """Update a feed's breaker after a download: reset on success; on failure count it and,
+    from BREAKER_THRESHOLD failures in a row, skip the feed's next BREAKER_COOLDOWN_RUNS
+    runs, doubling with every further failure (at most BREAKER_MAX_SKIP_RUNS)"""
+    now = datetime.now()
+    if error is None:
+        if previous and previous['failures']:
+            print(f"  {source}: recovered after {previous['failures']} failed fetches")
+        with get_db() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO feed_health (feed_url, source, failures, last_error, last_failure,
+                                                    last_success, skip_runs)
+                VALUES (?, ?, 0, NULL, ?, ?, 0)
+            ''', (feed_url, source, previous and previous['last_failure'], now.isoformat()))
+        return
+
+    failures = (previous['failures'] if previous else 0) + 1
+    skip_runs = 0
+    if failures >= BREAKER_THRESHOLD:
+        skip_runs = min(BREAKER_COOLDOWN_RUNS * 2 ** (failures - BREAKER_THRESHOLD), BREAKER_MAX_SKIP_RUNS)
+        METRICS.incr('breakers_opened', feed=source)
+        print(f"  {source}: {failures} failures in a row, skipping it for the next "
+              + ("run" if skip_runs == 1 else f"{skip_runs} runs"))
+    with get_db() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO feed_health (feed_url, source, failures, last_error, last_failure,
+                                                last_success, skip_runs)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (feed_url, source, failures, error, now.isoformat(), previous and previous['last_success'],
+              skip_runs))
+
+def feed_health_report(feeds: Dict[str, str]) -> Dict:
+    """{'total': number of feeds, 'failing': [feed_health rows of failing feeds]} for the digest footer"""
+    health = load_feed_health()
+    failing = [dict(health[url], source=source) for source, url in feeds.items()
+               if url in health and health[url]['failures']]
+    return {'total': len(feeds), 'failing': failing}
+
+def get_meta(key: str, default: str = None) -> Optional[str]:
+    row = get_db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(key: str, value: str):
+    with get_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def queue_for_digest(articles: List[Dict]):
+    """Persist new matches until the next digest goes out"""
+    queued_date = datetime.now().isoformat()
+    with get_db() as conn:
+        conn.executemany("INSERT OR IGNORE INTO pending_digest (key, payload, queued_date) VALUES (?, ?, ?)",
+                         [(a['key'], json.dumps(a, ensure_ascii=False), queued_date) for a in articles])
+
+def last_pending_rowid() -> int:
+    """Position of the newest queued match: a digest sent now covers the queue up to here"""
+    return get_db().execute("SELECT COALESCE(MAX(rowid), 0) FROM pending_digest").fetchone()[0]
+
+def iter_pending_digest(up_to: int = None) -> Iterator[Dict]:
+    """Queued matches, oldest first, streamed from the DB (up to rowid `up_to` if given)"""
+    where, params = ("WHERE rowid <= ?", (up_to,)) if up_to is not None else ("", ())
+    rows = get_db().execute(f"SELECT payload FROM pending_digest {where} ORDER BY queued_date, rowid", params)
+    return (json.loads(payload) for (payload,) in rows)
+
+def count_pending_digest() -> int:
+    return get_db().execute("SELECT COUNT(*) FROM pending_digest").fetchone()[0]
+
+def clear_pending_digest(up_to: int):
+    """Drop queued matches once they have been sent (those up to rowid `up_to`)"""
+    with get_db() as conn:
+        conn.execute("DELETE FROM pending_digest WHERE rowid <= ?", (up_to,))
+
+ARTICLE_COLUMNS = ('id', 'source', 'title', 'link', 'published', 'summary', 'seen_date', 'published_ts')
+
+def apply_retention(days: int = RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR) -> int:
+    """Move articles seen more than `days` ago into monthly archive files.
+
+    Rows are appended as JSON lines to archive/articles-YYYY-MM.jsonl.gz (by
+    seen month) before being deleted; their keys stay in seen_keys so
+    duplicates are still caught. Returns the number of rows archived.
+    """
+    if days <= 0:
+        return 0
+    import gzip
+
+    conn = get_db()
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    months = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(seen_date, 1, 7) FROM articles WHERE seen_date < ? ORDER BY 1", (cutoff,))]
+    if not months:
+        return 0
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    columns = ", ".join(ARTICLE_COLUMNS)
+    for month in months:
+        # Bounds selecting this month's rows that are past the cutoff
+        lower, upper = month, min(cutoff, f"{month}\uffff")
+        path = os.path.join(archive_dir, f"articles-{month}.jsonl.gz")
+        with gzip.open(path, 'at', encoding='utf-8') as f:  # appends a new gzip member
+            cursor = conn.execute(
+                f"SELECT {columns} FROM articles WHERE seen_date >= ? AND seen_date < ?", (lower, upper))
+            for row in cursor:
+                f.write(json.dumps(dict(zip(ARTICLE_COLUMNS, row)), ensure_ascii=False) + "\n")
+                archived += 1
+        with conn:
+            conn.execute("DELETE FROM articles WHERE seen_date >= ? AND seen_date < ?", (lower, upper))
+
+    print(f"Archived {archived} articles older than {days} days to {archive_dir}/")
+    return archived
+
+def compact_db(interval_days: int = VACUUM_INTERVAL_DAYS, force: bool = False) -> bool:
+    """VACUUM the database if the last compaction is older than interval_days"""
+    last = get_meta('last_vacuum')
+    if not force and last and datetime.fromisoformat(last) > datetime.now() - timedelta(days=interval_days):
+        return False
+    conn = get_db()
+    conn.execute("VACUUM")
+    # VACUUM may renumber articles' implicit rowids, which the FTS index points at
+    if fts_available():
+        with conn:
+            conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+    set_meta('last_vacuum', datetime.now().isoformat())
+    print("Database compacted (VACUUM)")
+    return True
+
+def run_maintenance():
+    """Retention and periodic compaction, run once per invocation after fetching"""
+    with METRICS.timer('maintenance'):
+        update_rollup()  # before retention deletes rows
+        apply_retention()
+        prune_cluster_history()
+        compact_db()
+
+def fts_available() -> bool:
+    """True if the articles_fts index exists (SQLite built with FTS5)"""
+    return get_db().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'").fetchone() is not None
+
+def init_fts():
+    """Create the FTS5 index over articles and backfill it once.
+
+    The index is external-content (no second copy of the text) and is kept in
+    sync by triggers, so every insert made through mark_articles_seen() and
+    every row removed by retention updates it incrementally.
+    """
+    conn = get_db()
+    try:
+        with conn:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                    title, summary, content='articles', content_rowid='rowid'
+                )
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+                    INSERT INTO articles_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+                    INSERT INTO articles_fts (articles_fts, rowid, title, summary)
+                    VALUES ('delete', old.rowid, old.title, old.summary);
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, summary ON articles BEGIN
+                    INSERT INTO articles_fts (articles_fts, rowid, title, summary)
+                    VALUES ('delete', old.rowid, old.title, old.summary);
+                    INSERT INTO articles_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+                END
+            ''')
+    except sqlite3.OperationalError as e:
+        print(f"Note: full-text search unavailable ({e})")
+        return
+
+    if not get_meta('fts_backfilled'):
+        with conn:
+            conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        set_meta('fts_backfilled', datetime.now().isoformat())
+
+def search_articles(query: str, source: str = None, since: str = None, until: str = None,
+                    limit: int = 20) -> List[Dict]:
+    """Full-text search over article history, best matches first.
+
+    `query` uses FTS5 syntax: words (implicit AND), OR, NOT, "exact phrases",
+    prefix*. since/until are ISO dates compared with the date the article was
+    first seen; title hits rank higher than summary hits.
+    """
+    sql = '''
+        SELECT a.id, a.source, a.title, a.link, a.published, a.seen_date,
+               snippet(articles_fts, 1, '[', ']', '...', 16) AS snippet,
+               bm25(articles_fts, 5.0, 1.0) AS rank
+        FROM articles_fts JOIN articles a ON a.rowid = articles_fts.rowid
+        WHERE articles_fts MATCH ?
+    '''
+    params = [query]
+    if source:
+        sql += " AND a.source = ?"
+        params.append(source)
+    if since:
+        sql += " AND a.seen_date >= ?"
+        params.append(since)
+    if until:
+        sql += " AND a.seen_date < ?"
+        params.append(until)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    cursor = get_db().execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+# Analytics: incremental exports of the article history and daily rollups
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '50000'))  # rows per compressed file
+
+def _write_export_chunk(path: str, rows: List[Tuple], fmt: str):
+    """Write one gzip-compressed JSONL or CSV chunk, via a temporary file so readers never see half a chunk"""
+    import gzip
+    import csv
+
+    with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(ARTICLE_COLUMNS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(ARTICLE_COLUMNS, row)), ensure_ascii=False) + "\n")
+    os.replace(f"{path}.tmp", path)
+
+def export_articles(output_dir: str = EXPORT_DIR, fmt: str = 'jsonl', chunk_rows: int = EXPORT_CHUNK_ROWS,
+                    full: bool = False) -> Tuple[int, List[str]]:
+    """Stream articles first seen since the last export to compressed chunk files.
+
+    Files are named articles-<timestamp>-<n>.<fmt>.gz. The export watermark
+    (the newest seen_date written) is kept in meta and only advanced once
+    every chunk is on disk, so an interrupted export is simply repeated.
+    `full` ignores the watermark. Returns (rows exported, files written).
+    """
+    conn = get_db()
+    watermark = '' if full else get_meta('export_watermark', '')
+    cursor = conn.execute(f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles WHERE seen_date > ? "
+                          "ORDER BY seen_date", (watermark,))
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    seen_date_index = ARTICLE_COLUMNS.index('seen_date')
+    exported = 0
+    files = []
+    for rows in _batched(cursor, chunk_rows):
+        path = os.path.join(output_dir, f"articles-{stamp}-{len(files) + 1:04d}.{fmt}.gz")
+        _write_export_chunk(path, rows, fmt)
+        files.append(path)
+        exported += len(rows)
+        watermark = rows[-1][seen_date_index]
+    if files:
+        set_meta('export_watermark', watermark)
+    return exported, files
+
+def update_rollup() -> int:
+    """Add articles first seen since the last rollup to daily_rollup.
+
+    Each article counts once under keyword '' and once per keyword it
+    matches, on its published day (UTC), or the day it was first seen when
+    the feed date is unparseable. Must run before retention removes rows.
+    Returns the number of articles rolled up.
+    """
+    conn = get_db()
+    watermark = get_meta('rollup_watermark', '')
+    cursor = conn.execute("SELECT source, title, summary, published_ts, seen_date FROM articles "
+                          "WHERE seen_date > ? ORDER BY seen_date", (watermark,))
+    counts = Counter()
+    rolled = 0
+    for source, title, summary, published_ts, seen_date in cursor:
+        if published_ts is not None:
+            day = datetime.fromtimestamp(published_ts, timezone.utc).strftime('%Y-%m-%d')
+        else:
+            day = seen_date[:10]
+        counts[(day, source, '')] += 1
+        for keyword in matches_keywords(f"{title} {summary}", KEYWORDS):
+            counts[(day, source, keyword)] += 1
+        watermark = seen_date
+        rolled += 1
+    if not rolled:
+        return 0
+    with conn:
+        conn.executemany('''
+            INSERT INTO daily_rollup (day, source, keyword, hits) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, source, keyword) DO UPDATE SET hits = hits + excluded.hits
+        ''', [key + (hits,) for key, hits in counts.items()])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_watermark', ?)", (watermark,))
+    return rolled
+
+TREND_PERIODS = {'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m'}
+
+def keyword_trends(keywords: List[str] = None, source: str = None, since: str = None,
+                   period: str = 'week') -> List[Tuple[str, str, str, int]]:
+    """(period, source, keyword, hits) from daily_rollup, oldest period first.
+
+    Without keywords, returns article counts (keyword '') per source instead.
+    `since` is an ISO date; keywords are matched case-insensitively.
+    """
+    keywords = [k.lower() for k in keywords or []]
+    sql = "SELECT strftime(?, day) AS period, source, keyword, SUM(hits) FROM daily_rollup WHERE "
+    params = [TREND_PERIODS[period]]
+    if keywords:
+        sql += f"lower(keyword) IN ({','.join('?' * len(keywords))})"
+        params.extend(keywords)
+    else:
+        sql += "keyword = ''"
+    if source:
+        sql += " AND source = ?"
+        params.append(source)
+    if since:
+        sql += " AND day >= ?"
+        params.append(since)
+    sql += " GROUP BY period, source, keyword ORDER BY period, source, keyword"
+    return get_db().execute(sql, params).fetchall()
+
+_WORD_RE = re.compile(r'\w+')
+_WORD_CHAR_RE = re.compile(r'\w')
+
+class KeywordMatcher:
+    """Keyword matcher compiled once from a keyword list.
+
+    Equivalent to searching r'\b<keyword>\b' in the lowercased text for every
+    keyword, but makes a single pass over the words of the text: each word is
+    looked up in a table of keywords indexed by their first word, and only
+    those candidates are compared in place with a word-boundary check at the end.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._by_first_word = {}  # first word -> [(lowercased keyword, index)]
+        self._fallback = []       # (index, pattern) for keywords not bounded by word characters
+        for index, keyword in enumerate(self.keywords):
+            lowered = keyword.lower()
+            first_word = _WORD_RE.match(lowered)
+            if first_word and _WORD_CHAR_RE.fullmatch(lowered[-1]):
+                self._by_first_word.setdefault(first_word.group(), []).append((lowered, index))
+            else:
+                self._fallback.append((index, re.compile(r'\b' + re.escape(lowered) + r'\b')))
+
+    def match(self, text: str) -> List[str]:
+        """Return matched keywords, in keyword-list order"""
+        text_lower = text.lower()
+        by_first_word = self._by_first_word
+        hits = set()
+        for word in _WORD_RE.finditer(text_lower):
+            candidates = by_first_word.get(word.group())
+            if not candidates:
+                continue
+            start = word.start()
+            for lowered, index in candidates:
+                if index in hits:
+                    continue
+                if (text_lower.startswith(lowered, start)
+                        and not _WORD_CHAR_RE.match(text_lower, start + len(lowered))):
+                    hits.add(index)
+        for index, pattern in self._fallback:
+            if pattern.search(text_lower):
+                hits.add(index)
+        return [self.keywords[i] for i in sorted(hits)]
+
+    def to_dict(self) -> Dict:
+        return {
+            'keywords': self.keywords,
+            'by_first_word': self._by_first_word,
+            'fallback': [(index, pattern.pattern) for index, pattern in self._fallback],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KeywordMatcher':
+        """Rebuild a matcher from to_dict() output without re-indexing the keywords"""
+        matcher = cls.__new__(cls)
+        matcher.keywords = list(data['keywords'])
+        matcher._by_first_word = {word: [tuple(c) for c in candidates]
+                                  for word, candidates in data['by_first_word'].items()}
+        matcher._fallback = [(index, re.compile(pattern)) for index, pattern in data['fallback']]
+        return matcher
+
+# 'compiled' (default), 'legacy' (per-keyword regex) or 'compare' (run both, report differences)
+KEYWORD_MATCHER = os.environ.get('KEYWORD_MATCHER', 'compiled')
+
+# Compiled matchers are also cached on disk, keyed by a hash of the keyword set (empty = off)
+MATCHER_CACHE_DIR = os.environ.get('MATCHER_CACHE_DIR', '.cache')
+_MATCHER_FORMAT = 1  # bump when KeywordMatcher's tables change shape
+
+_matcher_cache = {}
+_matcher_lock = threading.Lock()
+
+def keyword_set_hash(keywords: List[str]) -> str:
+    digest = hashlib.sha256(f"v{_MATCHER_FORMAT}\n".encode())
+    digest.update("\n".join(keywords).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def _load_cached_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    """Matcher from the disk cache, or built and written there"""
+    if not MATCHER_CACHE_DIR:
+        return KeywordMatcher(keywords)
+    path = os.path.join(MATCHER_CACHE_DIR, f"matcher-{keyword_set_hash(keywords)}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            matcher = KeywordMatcher.from_dict(json.load(f))
+        if tuple(matcher.keywords) == keywords:
+            METRICS.incr('matcher_cache_hits')
+            return matcher
+    except (OSError, ValueError, KeyError, TypeError, re.error):
+        pass
+
+    matcher = KeywordMatcher(keywords)
+    try:
+        os.makedirs(MATCHER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(matcher.to_dict(), f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"  Could not cache keyword matcher: {e}")
+    return matcher
+
+def get_keyword_matcher(keywords: List[str]) -> KeywordMatcher:
+    """Return the compiled matcher for a keyword list, loading or building it on first use"""
+    key = tuple(keywords)
+    matcher = _matcher_cache.get(key)
+    if matcher is None:
+        with _matcher_lock:
+            matcher = _matcher_cache.get(key)
+            if matcher is None:
+                with METRICS.timer('matcher'):
+                    matcher = _matcher_cache[key] = _load_cached_matcher(key)
+    return matcher
+
+def matches_keywords_legacy(text: str, keywords: List[str]) -> List[str]:
     """Check if text contains any keywords (case-insensitive), return matched keywords"""
     text_lower = text.lower()
     matched = []
@@ -174,55 +1099,887 @@ def matches_keywords(text: str, keywords: List[str]) -> List[str]:
             matched.append(keyword)
     return matched
 
-def fetch_feed(source_name: str, feed_url: str) -> List[Dict]:
-    """Fetch and parse RSS feed"""
+def matches_keywords(text: str, keywords: List[str]) -> List[str]:
+    """Check if text contains any keywords (case-insensitive), return matched keywords"""
+    if KEYWORD_MATCHER == 'legacy':
+        return matches_keywords_legacy(text, keywords)
+
+    matched = get_keyword_matcher(keywords).match(text)
+    if KEYWORD_MATCHER == 'compare':
+        expected = matches_keywords_legacy(text, keywords)
+        if matched != expected:
+            METRICS.incr('matcher_mismatches')
+            print(f"  Matcher mismatch: compiled={matched} legacy={expected} text={text[:80]!r}")
+            return expected
+    return matched
+
+class HostThrottle:
+    """Politeness rules per host: one request at a time, spaced HOST_DELAY apart"""
+
+    def __init__(self, delay: float = HOST_DELAY):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._hosts = {}  # host -> [lock, time of last request]
+
+    @contextmanager
+    def slot(self, url: str):
+        host = (urlsplit(url).hostname or '').lower()
+        with self._lock:
+            entry = self._hosts.setdefault(host, [threading.Lock(), 0.0])
+        with entry[0]:
+            wait = entry[1] + self.delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                yield
+            finally:
+                entry[1] = time.monotonic()
+
+_http_opener = None
+
+def get_http_opener() -> 'urllib.request.OpenerDirector':
+    """URL opener sharing one TLS context (CA bundle loaded once per process)"""
+    global _http_opener
+    if _http_opener is None:
+        import ssl
+        import urllib.request
+        context = ssl.create_default_context()
+        _http_opener = urllib.request.build_opener(urllib.request.HTTPSHandler(context=context))
+    return _http_opener
+
+def download_feed(feed_url: str, timeout: float = FEED_TIMEOUT, etag: str = None,
+                  modified: str = None, feed: str = None,
+                  connect_timeout: float = FEED_CONNECT_TIMEOUT) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """Download raw feed bytes, enforcing an overall deadline for the whole transfer.
+
+    `connect_timeout` bounds connecting and waiting for each read, `timeout`
+    the whole transfer. Sends If-None-Match/If-Modified-Since when validators
+    are given and returns (None, headers) on 304 Not Modified.
+    headers['x-wire-size'] holds the number of bytes actually transferred.
+    Timings are recorded under `feed` as 'connect' (DNS, TCP, TLS and wait for
+    the response headers) and 'download'.
+    """
+    import urllib.error
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    request_headers = {
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': 'gzip, deflate',
+    }
+    if etag:
+        request_headers['If-None-Match'] = etag
+    if modified:
+        request_headers['If-Modified-Since'] = modified
+    request = urllib.request.Request(feed_url, headers=request_headers)
+
     try:
-        print(f"Fetching {source_name}...")
-        feed = feedparser.parse(feed_url)
-        
-        articles = []
-        for entry in feed.entries:
-            title = entry.get('title', 'No title')
-            link = entry.get('link', '')
-            summary = entry.get('summary', entry.get('description', ''))
-            published = entry.get('published', entry.get('updated', ''))
-            
-            # Combine title and summary for keyword matching
-            search_text = f"{title} {summary}"
-            
-            # Check if matches any keywords
-            matched_keywords = matches_keywords(search_text, KEYWORDS)
-            
-            if matched_keywords:
-                article_id = get_article_hash(title, link)
-                
-                # Only include if not seen before (delta)
-                if not is_article_seen(article_id):
-                    articles.append({
-                        'id': article_id,
-                        'source': source_name,
-                        'title': title,
-                        'link': link,
-                        'summary': summary[:300],  # Truncate long summaries
-                        'published': published,
-                        'matched_keywords': matched_keywords
-                    })
-                    
-                    # Mark as seen
-                    mark_article_seen(article_id, source_name, title, link, published, summary)
-        
-        print(f"  Found {len(articles)} new matching articles")
-        return articles
-        
-    except Exception as e:
-        print(f"  Error fetching {source_name}: {e}")
+        with METRICS.timer('connect', feed):
+            response = get_http_opener().open(request, timeout=min(connect_timeout, timeout))
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, {k.lower(): v for k, v in e.headers.items()}
+        raise
+
+    with response, METRICS.timer('download', feed):
+        chunks = []
+        while True:
+            chunk = response.read(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"download exceeded {timeout:.0f}s")
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        # Base URI for relative links, as feedparser.parse(feed_url) would use
+        headers.setdefault('content-location', response.geturl())
+
+    data = b"".join(chunks)
+    headers['x-wire-size'] = str(len(data))
+    encoding = headers.pop('content-encoding', '').lower()
+    if encoding == 'gzip':
+        import gzip
+        data = gzip.decompress(data)
+    elif encoding == 'deflate':
+        data = zlib.decompress(data)
+    return data, headers
+
+_host_timeouts = None
+
+def host_timeouts(url: str) -> Tuple[float, float]:
+    """(connect/read timeout, total timeout) for a feed URL, from HOST_TIMEOUTS or the defaults"""
+    global _host_timeouts
+    if _host_timeouts is None:
+        _host_timeouts = {}
+        for item in filter(None, (part.strip() for part in HOST_TIMEOUTS.split(','))):
+            host, _, seconds = item.partition('=')
+            connect, _, total = seconds.partition('/')
+            _host_timeouts[host.strip().lower()] = (float(connect), float(total or FEED_TIMEOUT))
+    host = (urlsplit(url).hostname or '').lower()
+    return _host_timeouts.get(host, (FEED_CONNECT_TIMEOUT, FEED_TIMEOUT))
+
+class FetchBudgetExceeded(TimeoutError):
+    """The run's FETCH_BUDGET ran out before this feed could be (re)tried"""
+
+class FeedParseError(ValueError):
+    """A feed downloaded fine but could not be parsed or matched (not held against its breaker)"""
+
+def _fetch_transient(error: Exception) -> bool:
+    """True for download failures worth retrying: timeouts, connection errors, 408/429 and 5xx replies"""
+    import urllib.error
+
+    if isinstance(error, FetchBudgetExceeded):
+        return False
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in (408, 425, 429) or error.code >= 500
+    import http.client
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+def _timed_out(error: Exception) -> bool:
+    """True if a download failed by timing out (directly or wrapped in a URLError)"""
+    import urllib.error
+
+    if isinstance(error, urllib.error.URLError) and isinstance(error.reason, Exception):
+        error = error.reason
+    return isinstance(error, TimeoutError)
+
+def _retry_after(error: Exception) -> float:
+    """Seconds asked for by a Retry-After header (delay form only), else 0"""
+    headers = getattr(error, 'headers', None)
+    try:
+        return float(headers.get('Retry-After', 0)) if headers else 0.0
+    except ValueError:
+        return 0.0
+
+def download_with_retries(feed_url: str, etag: str = None, modified: str = None, feed: str = None,
+                          deadline: float = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """download_feed with the host's timeouts, retrying transient failures.
+
+    Retries back off exponentially from FETCH_BACKOFF seconds (with jitter,
+    or as asked by Retry-After) up to FETCH_RETRIES times. Attempts are cut
+    short so that nothing runs past `deadline` (a time.monotonic() value).
+    FetchBudgetExceeded is raised when no time is left to start one, when
+    an attempt times out because the deadline (not the host's timeout) cut
+    it short, or when the deadline leaves no time for a retry.
+    """
+    connect_timeout, timeout = host_timeouts(feed_url)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic() if deadline else timeout
+        if remaining <= 0:
+            raise FetchBudgetExceeded("fetch budget for this run exhausted")
+        try:
+            return download_feed(feed_url, min(timeout, remaining), etag, modified, feed,
+                                 connect_timeout=min(connect_timeout, remaining))
+        except Exception as e:
+            if deadline and remaining < timeout and _timed_out(e) and time.monotonic() >= deadline:
+                raise FetchBudgetExceeded("fetch budget for this run ran out during the download") from e
+            if attempt >= FETCH_RETRIES or not _fetch_transient(e):
+                raise
+            delay = max(FETCH_BACKOFF * 2 ** attempt * random.uniform(0.75, 1.25), _retry_after(e))
+            if deadline and time.monotonic() + delay >= deadline:
+                raise FetchBudgetExceeded(f"fetch budget for this run exhausted before a retry "
+                                          f"({fetch_error_label(e)})") from e
+            attempt += 1
+            METRICS.incr('fetch_retries', feed=feed)
+            print(f"  {feed or feed_url}: {fetch_error_label(e)}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def fetch_error_label(error: Exception) -> str:
+    """Short description of a fetch failure, for logs, feed_health and the digest footer"""
+    import urllib.error
+
+    if isinstance(error, urllib.error.HTTPError):
+        return f"HTTP {error.code}"
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason if isinstance(error.reason, Exception) else error
+    if isinstance(error, TimeoutError) and not isinstance(error, FetchBudgetExceeded):
+        return "timed out"
+    return (str(error) or type(error).__name__)[:120]
+
+def fetch_if_changed(feed_url: str, cached: Dict = None, feed: str = None,
+                     deadline: float = None) -> Tuple[Optional[bytes], Dict[str, str], Dict]:
+    """Conditional fetch of a feed (see download_with_retries for `deadline`).
+
+    Returns (data, headers, cache_entry). data is None when the server answered
+    304 or the body hash matches the cached one, so parsing can be skipped.
+    cache_entry['status'] is 'not_modified', 'unchanged' or 'changed'.
+    """
+    cached = cached or {}
+    data, headers = download_with_retries(feed_url, etag=cached.get('etag'), modified=cached.get('last_modified'),
+                                          feed=feed, deadline=deadline)
+    entry = {
+        'feed_url': feed_url,
+        'etag': headers.get('etag', cached.get('etag')),
+        'last_modified': headers.get('last-modified', cached.get('last_modified')),
+        'body_hash': cached.get('body_hash'),
+        'body_size': cached.get('body_size'),
+        'wire_size': int(headers.get('x-wire-size', 0)),
+        **{column: cached.get(column) for column in HWM_COLUMNS},
+    }
+    if data is None:
+        entry['status'] = 'not_modified'
+        return None, headers, entry
+
+    body_hash = hashlib.sha256(data).hexdigest()
+    entry['status'] = 'unchanged' if body_hash == cached.get('body_hash') else 'changed'
+    entry['body_hash'] = body_hash
+    entry['body_size'] = entry['wire_size']
+    if entry['status'] == 'unchanged':
+        return None, headers, entry
+    return data, headers, entry
+
+def record_cache_result(entry: Dict, source: str = None):
+    """Update run metrics for a fetched feed and persist its validators"""
+    METRICS.incr('feeds_fetched', feed=source)
+    METRICS.incr('bytes_downloaded', entry['wire_size'], feed=source)
+    if entry['status'] == 'not_modified':
+        METRICS.incr('feeds_not_modified', feed=source)
+        METRICS.incr('bytes_saved', entry.get('body_size') or 0, feed=source)
+    elif entry['status'] == 'unchanged':
+        METRICS.incr('feeds_unchanged', feed=source)
+    with METRICS.timer('db', source):
+        save_feed_cache(entry)
+
+def parse_entries(data: bytes, headers: Dict[str, str] = None) -> List[Dict]:
+    """Parse feed bytes into plain entry dicts (title, link, summary, published)"""
+    import feedparser
+
+    feed = feedparser.parse(data, response_headers=headers or {})
+    return [{
+        'title': entry.get('title', 'No title'),
+        'link': entry.get('link', ''),
+        'guid': entry.get('id', ''),
+        'summary': entry.get('summary', entry.get('description', '')),
+        'published': entry.get('published', entry.get('updated', '')),
+    } for entry in feed.entries]
+
+# Feed documents larger than this are parsed incrementally (see iter_entries)
+STREAM_PARSE_BYTES = int(os.environ.get('STREAM_PARSE_BYTES', str(8 * 1024 * 1024)))
+STREAM_BATCH = int(os.environ.get('STREAM_BATCH', '500'))  # entries deduplicated/written per transaction
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def _sanitize_summary(text: str, base_url: str = '') -> str:
+    """Clean summary markup as feedparser does: relative URIs resolved, scripts and event handlers dropped"""
+    if '<' not in text and '&' not in text:
+        return text
+    from feedparser.sanitizer import _sanitize_html
+    from feedparser.urls import resolve_relative_uris
+
+    if base_url:
+        text = resolve_relative_uris(text, base_url, 'utf-8', 'text/html')
+    return _sanitize_html(text, 'utf-8', 'text/html')
+
+def _entry_fields(item, base_url: str = '') -> Dict:
+    fields = {}
+    link = None
+    permalink = False
+    for child in item:
+        name = _local_name(child.tag)
+        if name == 'guid' and name not in fields:
+            permalink = child.get('isPermaLink', 'true').lower() == 'true'
+        if name == 'link':
+            href = child.get('href')
+            if href is None:
+                link = link or (child.text or '').strip()
+            elif link is None and child.get('rel', 'alternate') == 'alternate':
+                link = href.strip()
+        elif name not in fields:
+            fields[name] = "".join(child.itertext()).strip()
+    # Like feedparser: a permalink <guid> is resolved and stands in for a missing link
+    guid = fields.get('guid')
+    if guid and permalink:
+        guid = urljoin(base_url, guid) if base_url else guid
+        link = link or guid
+    if link and base_url:
+        link = urljoin(base_url, link)
+    return {
+        'title': fields.get('title', 'No title'),
+        'link': link or '',
+        'guid': guid or fields.get('id', ''),
+        'summary': _sanitize_summary(fields.get('summary', fields.get('description', '')), base_url),
+        'published': (fields.get('pubDate') or fields.get('published') or fields.get('date')
+                      or fields.get('updated', '')),
+    }
+
+def iter_entries(source, base_url: str = '') -> Iterator[Dict]:
+    """Stream entry dicts (as parse_entries) from an RSS/Atom document.
+
+    `source` is a path or binary file object; relative links are resolved
+    against `base_url`. Each <item>/<entry> is dropped from the tree once
+    read, so memory stays flat however long the document is. Summaries are
+    sanitised like feedparser's, and the XML must be well-formed
+    (ET.ParseError otherwise).
+    """
+    import xml.etree.ElementTree as ET
+
+    parents = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element.tag) in ('item', 'entry'):
+            yield _entry_fields(element, base_url)
+            if parents:
+                parents[-1].remove(element)
+
+def iter_matches(source_name: str, entries: Iterator[Dict]) -> Iterator[Dict]:
+    """Lazily yield entries matching KEYWORDS, as candidate articles (not yet deduplicated)"""
+    parsed = matched = 0
+    for entry in entries:
+        parsed += 1
+        title = entry['title']
+        link = entry['link']
+
+        # Combine title and summary for keyword matching
+        search_text = f"{title} {entry['summary']}"
+
+        # Check if matches any keywords
+        matched_keywords = matches_keywords(search_text, KEYWORDS)
+
+        if matched_keywords:
+            matched += 1
+            yield {
+                'id': get_article_hash(title, link),
+                'source': source_name,
+                'title': title,
+                'link': link,
+                'guid': entry.get('guid', ''),
+                'summary': entry['summary'],
+                'published': entry['published'],
+                'matched_keywords': matched_keywords
+            }
+    METRICS.incr('entries_parsed', parsed, feed=source_name)
+    METRICS.incr('matches', matched, feed=source_name)
+
+def match_entries(source_name: str, entries: List[Dict]) -> List[Dict]:
+    """Keep entries matching KEYWORDS, as candidate articles (not yet deduplicated)"""
+    return list(iter_matches(source_name, entries))
+
+# Entries older than this before a feed's previous newest entry are skipped
+# without matching, for feeds whose dates looked reliable (see EntryMark)
+class EntryMark:
+    """High-water mark of one feed, used to drop entries already processed
+    on the previous fetch before any keyword matching or DB lookup.
+
+    It holds a fingerprint (GUID, else link, else title) of every entry in
+    the last fetch; an entry is skipped only if its fingerprint is known, so
+    a new entry is always matched however old its date. A mark made with
+    another keyword list is ignored so that keyword changes re-match
+    everything. filter() also builds the mark for the next fetch, read back
+    with to_cache().
+    """
+
+    def __init__(self, fingerprints: bytes = b'', keywords_hash: str = None):
+        self.fingerprints = set(array('q', fingerprints or b''))
+        self.usable = keywords_hash == keyword_set_hash(KEYWORDS)
+        self._next = None
+
+    @classmethod
+    def from_cache(cls, cached: Dict = None) -> 'EntryMark':
+        cached = cached or {}
+        return cls(cached.get('hwm_keys'), cached.get('hwm_keywords'))
+
+    def filter(self, source_name: str, entries: Iterator[Dict]) -> Iterator[Dict]:
+        """Yield the entries not handled on the previous fetch"""
+        fingerprints = array('q')
+        skipped = 0
+        for entry in entries:
+            fingerprint = _key64(entry.get('guid') or entry['link'] or entry['title'])
+            fingerprints.append(fingerprint)
+            if self.usable and fingerprint in self.fingerprints:
+                skipped += 1
+                continue
+            yield entry
+        METRICS.incr('entries_skipped', skipped, feed=source_name)
+        self._next = fingerprints
+
+    def to_cache(self) -> Dict:
+        """feed_cache columns for the next fetch (the current mark if filter() has not finished)"""
+        if self._next is None:
+            fingerprints = array('q', self.fingerprints)
+            keywords_hash = keyword_set_hash(KEYWORDS) if self.usable else None
+        else:
+            fingerprints, keywords_hash = self._next, keyword_set_hash(KEYWORDS)
+        return {'hwm_keys': fingerprints.tobytes(), 'hwm_keywords': keywords_hash}
+
+def parse_feed(source_name: str, data: bytes, headers: Dict[str, str] = None,
+               mark: EntryMark = None) -> List[Dict]:
+    """Parse feed bytes and return entries matching KEYWORDS (not yet deduplicated).
+
+    Documents over STREAM_PARSE_BYTES are streamed through iter_entries so
+    only the matches are held, falling back to feedparser if the XML is not
+    well-formed. With a `mark`, entries from the previous fetch are dropped
+    before matching and the mark is advanced.
+    """
+    if len(data) > STREAM_PARSE_BYTES:
+        import xml.etree.ElementTree as ET
+        try:
+            with METRICS.timer('parse', source_name):
+                entries = iter_entries(io.BytesIO(data), (headers or {}).get('content-location', ''))
+                if mark is not None:
+                    entries = mark.filter(source_name, entries)
+                return list(iter_matches(source_name, entries))
+        except ET.ParseError as e:
+            print(f"  {source_name}: not well-formed XML ({e}), parsing with feedparser")
+    with METRICS.timer('parse', source_name):
+        entries = parse_entries(data, headers)
+    with METRICS.timer('match', source_name):
+        if mark is not None:
+            entries = mark.filter(source_name, entries)
+        return match_entries(source_name, entries)
+
+def truncate_summary(summary: str, limit: int = 300) -> str:
+    """Truncate a long summary without cutting a tag in half"""
+    summary = summary[:limit]
+    if summary.rfind('<') > summary.rfind('>'):
+        summary = summary[:summary.rfind('<')]
+    return summary
+
+def store_new_articles(candidates: List[Dict]) -> List[Dict]:
+    """Keep only unseen candidates (delta), mark them as seen and return them.
+
+    Seen IDs are checked in bulk and new rows written in a single transaction.
+    """
+    if not candidates:
         return []
+    source = candidates[0]['source']
+    with METRICS.timer('db', source):
+        return _store_new_articles(candidates, source)
 
-def generate_html_digest(articles: List[Dict]) -> str:
-    """Generate HTML email digest"""
-    
+def _store_new_articles(candidates: List[Dict], source: str) -> List[Dict]:
+    keys = [article_keys(c['title'], c['link'], c.get('guid', '')) for c in candidates]
+    lookup = {key for candidate_keys in keys for key in candidate_keys}
+    # Rows archived before the seen_keys migration are only known by their old ID
+    legacy = get_meta('seen_keys_legacy', '0') != '0'
+    if legacy:
+        lookup.update(legacy_key(c['id']) for c in candidates)
+    seen = find_seen_keys(lookup)
+    articles = []
+    rows = []
+    new_keys = []
+    for candidate, candidate_keys in zip(candidates, keys):
+        # Only include if not seen before (delta)
+        if seen.isdisjoint(candidate_keys) and not (legacy and legacy_key(candidate['id']) in seen):
+            seen.update(candidate_keys)
+            new_keys.extend(candidate_keys)
+            articles.append(dict(candidate, key=candidate_keys[0],
+                                 summary=truncate_summary(candidate['summary'])))
+            rows.append((candidate['id'], candidate['source'], candidate['title'], candidate['link'],
+                         candidate['published'], candidate['summary']))
+
+    # Mark as seen
+    if rows:
+        mark_articles_seen(rows, new_keys)
+    METRICS.incr('new_items', len(articles), feed=source)
+    return articles
+
+_parse_pool = None
+_parse_pool_key = None
+
+def _init_parse_worker(keywords: List[str], matcher_mode: str):
+    """Process pool initializer: build this worker's keyword matcher once, up front"""
+    global KEYWORDS, KEYWORD_MATCHER
+    KEYWORDS = list(keywords)
+    KEYWORD_MATCHER = matcher_mode
+    get_keyword_matcher(KEYWORDS)  # from the disk cache when possible
+    import feedparser  # noqa: F401  (loaded once per worker, not in the first task)
+
+def _compact_candidates(candidates: Iterator[Dict]) -> Tuple[List[Tuple], Dict, Dict]:
+    """Candidates as tuples (matched keywords as indexes into KEYWORDS), plus this process's metrics"""
+    keyword_index = {keyword: i for i, keyword in enumerate(KEYWORDS)}
+    compact = [(c['id'], c['title'], c['link'], c['guid'], c['summary'], c['published'],
+                [keyword_index[k] for k in c['matched_keywords']]) for c in candidates]
+    return compact, dict(METRICS.counters), dict(METRICS.timers)
+
+def _expand_candidates(source_name: str, result: Tuple) -> List[Dict]:
+    """Back in the main process: candidate dicts from _compact_candidates output, merging its metrics"""
+    candidates, counters, timers = result[:3]
+    METRICS.merge(counters, timers)
+    return [{
+        'id': article_id,
+        'source': source_name,
+        'title': title,
+        'link': link,
+        'guid': guid,
+        'summary': summary,
+        'published': published,
+        'matched_keywords': [KEYWORDS[i] for i in keyword_indexes],
+    } for article_id, title, link, guid, summary, published, keyword_indexes in candidates]
+
+def _parse_task(source_name: str, data: bytes, headers: Dict[str, str],
+                mark: EntryMark = None) -> Tuple[List[Tuple], Dict, Dict, Optional[EntryMark]]:
+    """Runs in a worker process: parse_feed on downloaded bytes; the advanced mark is returned too"""
+    METRICS.reset()
+    return _compact_candidates(parse_feed(source_name, data, headers, mark)) + (mark,)
+
+def _import_task(source_name: str, location: str) -> Tuple[List[Tuple], Dict, Dict]:
+    """Runs in a worker process: stream and match one import file (matches are held, entries are not)"""
+    METRICS.reset()
+    return _compact_candidates(iter_matches(source_name, iter_import_entries(location)))
+
+def get_parse_pool(processes: int = PARSE_PROCESSES):
+    """The process pool for parsing and matching, or None when PARSE_PROCESSES is 0.
+
+    Workers are spawned (not forked, as fetch threads may be running) and
+    kept between runs; the pool is only rebuilt when the keywords change.
+    """
+    global _parse_pool, _parse_pool_key
+    if processes <= 0:
+        return None
+    key = (tuple(KEYWORDS), KEYWORD_MATCHER, processes)
+    if _parse_pool is None or _parse_pool_key != key:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        shutdown_parse_pool()
+        get_keyword_matcher(KEYWORDS)  # write the disk cache once, before the workers read it
+        _parse_pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'),
+                                          initializer=_init_parse_worker, initargs=(KEYWORDS, KEYWORD_MATCHER))
+        _parse_pool_key = key
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool, _parse_pool_key
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
+        _parse_pool = _parse_pool_key = None
+
+def collect_parse_task(source_name: str, future, entry: Dict) -> Tuple[List[Dict], Dict]:
+    """Candidates from a _parse_task future (see _download_and_parse), with the advanced mark in `entry`"""
+    try:
+        result = future.result()
+    except Exception as e:
+        raise FeedParseError(f"could not parse the feed: {e}") from e
+    entry.update(result[3].to_cache())  # saved with the validators once the candidates are stored
+    return _expand_candidates(source_name, result), entry
+
+def _download_and_parse(source_name: str, feed_url: str, throttle: HostThrottle,
+                        cached: Dict = None, pool=None, deadline: float = None) -> Tuple[Optional[List[Dict]], Dict]:
+    """Worker task: conditional download under the host's politeness slot, then parse and match.
+
+    Returns (candidates, cache_entry); candidates is None when the feed is
+    unchanged. With `pool` (a process pool) the parse is only submitted and
+    candidates is its future, so this thread is free for the next download
+    while the worker parses (see collect_parse_task).
+    """
+    print(f"Fetching {source_name}...")
+    with throttle.slot(feed_url), METRICS.timer('fetch', source_name):
+        data, headers, entry = fetch_if_changed(feed_url, cached, feed=source_name, deadline=deadline)
+    if data is None:
+        return None, entry
+    mark = EntryMark.from_cache(cached)
+    if pool is not None:
+        return pool.submit(_parse_task, source_name, data, headers or {}, mark), entry
+    try:
+        candidates = parse_feed(source_name, data, headers, mark)
+    except Exception as e:
+        raise FeedParseError(f"could not parse the feed: {e}") from e
+    entry.update(mark.to_cache())  # saved with the validators once the candidates are stored
+    return candidates, entry
+
+def iter_fetch_feeds(feeds: Dict[str, str], workers: int = FETCH_WORKERS, throttle: HostThrottle = None,
+                     outcomes: Dict[str, Dict] = None) -> Iterator[Dict]:
+    """Fetch every feed concurrently and yield new matching articles, feed by feed.
+
+    Downloads, parsing and keyword matching run in a thread pool as results
+    arrive; with PARSE_PROCESSES set, parsing and matching are handed on to
+    worker processes. Dedup and DB writes stay on the calling thread and are
+    applied in `feeds` order, so the result is identical to fetching the
+    feeds serially.
+    Feeds that answer 304 or return an unchanged body skip parsing entirely.
+    Feeds whose circuit breaker is open are not requested, and downloads
+    (with their retries) stop once FETCH_BUDGET seconds have passed.
+    If `outcomes` is given it is filled with {source: {'status', 'new'}}.
+    """
+    from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+    throttle = throttle or HostThrottle()
+    outcomes = {} if outcomes is None else outcomes
+    cache = load_feed_cache()
+    health = load_feed_health()
+    names = []
+    for name in feeds:
+        if breaker_open(health.get(feeds[name])):
+            state = health[feeds[name]]
+            skip_feed_run(feeds[name])
+            left = state['skip_runs'] - 1
+            print(f"  {name}: skipped after {state['failures']} failures ({state['last_error']}), "
+                  + (f"{left} more to skip" if left else "tried again next run"))
+            METRICS.incr('feeds_skipped_open', feed=name)
+            outcomes[name] = {'status': 'circuit_open', 'new': 0}
+        else:
+            names.append(name)
+    deadline = time.monotonic() + FETCH_BUDGET if FETCH_BUDGET > 0 else None
+    parsed = {}  # source -> (candidates, cache_entry), or the exception if the feed failed
+    parsing = {}  # source -> cache_entry, while its parse is on the process pool
+    next_index = 0
+    parse_pool = get_parse_pool()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {
+            pool.submit(_download_and_parse, name, feeds[name], throttle, cache.get(feeds[name]), parse_pool,
+                        deadline): name
+            for name in names
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            future = next(iter(done))
+            name = pending.pop(future)
+            try:
+                if name in parsing:
+                    parsed[name] = collect_parse_task(name, future, parsing.pop(name))
+                else:
+                    candidates, entry = future.result()
+                    if isinstance(candidates, Future):
+                        pending[candidates] = name  # downloaded; collected when the worker is done
+                        parsing[name] = entry
+                        continue
+                    parsed[name] = candidates, entry
+            except FetchBudgetExceeded as e:
+                print(f"  {name}: not fetched, {e}")
+                parsed[name] = e
+            except FeedParseError as e:
+                print(f"  Error parsing {name}: {e}")
+                METRICS.incr('parse_errors', feed=name)
+                parsed[name] = e
+            except Exception as e:
+                print(f"  Error fetching {name}: {fetch_error_label(e)}")
+                METRICS.incr('fetch_errors', feed=name)
+                parsed[name] = e
+
+            # Commit every feed whose predecessors are all done
+            while next_index < len(names) and names[next_index] in parsed:
+                source = names[next_index]
+                result = parsed.pop(source)
+                next_index += 1
+                if isinstance(result, FetchBudgetExceeded):
+                    METRICS.incr('feeds_over_budget', feed=source)
+                    outcomes[source] = {'status': 'budget', 'new': 0}
+                    continue
+                if isinstance(result, FeedParseError):
+                    outcomes[source] = {'status': 'error', 'new': 0}  # the download worked; breaker unchanged
+                    continue
+                if isinstance(result, Exception):
+                    record_feed_health(feeds[source], source, fetch_error_label(result), health.get(feeds[source]))
+                    outcomes[source] = {'status': 'error', 'new': 0}
+                    continue
+                record_feed_health(feeds[source], source, previous=health.get(feeds[source]))
+                candidates, entry = result
+                if candidates is None:
+                    print(f"  {source}: {entry['status'].replace('_', ' ')}, skipped")
+                    record_cache_result(entry, source)
+                    outcomes[source] = {'status': entry['status'], 'new': 0}
+                    continue
+                articles = store_new_articles(candidates)
+                record_cache_result(entry, source)
+                outcomes[source] = {'status': entry['status'], 'new': len(articles)}
+                print(f"  {source}: found {len(articles)} new matching articles")
+                yield from articles
+
+def _batched(items: Iterator, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_clustered_batches(articles: Iterator[Dict], batch_size: int = STREAM_BATCH) -> Iterator[List[Dict]]:
+    """Cluster a stream of stored articles (e.g. from iter_fetch_feeds) in fixed-size batches.
+
+    Each batch is grouped on its own; a story split across batches is
+    matched against the earlier batch's stored signatures like any earlier
+    story (see cluster_articles).
+    """
+    for batch in _batched(articles, batch_size):
+        yield cluster_articles(batch)
+
+def iter_new_articles(candidates: Iterator[Dict], batch_size: int = STREAM_BATCH) -> Iterator[Dict]:
+    """Deduplicate, store and cluster a stream of candidates in fixed-size batches.
+
+    Nothing is read from `candidates` until the consumer asks for more, so at
+    most one batch is held at a time. Near-duplicates in different batches are
+    caught through the signatures stored by earlier batches at the stricter
+    history threshold; each one dropped this way is logged.
+    """
+    for batch in _batched(candidates, batch_size):
+        yield from cluster_articles(store_new_articles(batch))
+
+def print_run_stats():
+    """Print fetch/cache counters and stage timings for the run"""
+    if not METRICS.total('feeds_fetched'):
+        return
+    print(f"Feeds fetched: {METRICS.total('feeds_fetched'):.0f} "
+          f"({METRICS.total('feeds_not_modified'):.0f} not modified, {METRICS.total('feeds_unchanged'):.0f} unchanged)")
+    print(f"Bytes downloaded: {METRICS.total('bytes_downloaded'):,.0f}, "
+          f"saved by cache: {METRICS.total('bytes_saved'):,.0f}")
+    if METRICS.total('entries_skipped'):
+        print(f"Entries skipped early (in the feed's previous fetch): {METRICS.total('entries_skipped'):,.0f} "
+              f"of {METRICS.total('entries_skipped') + METRICS.total('entries_parsed'):,.0f}")
+    if METRICS.total('clustered_duplicates') or METRICS.total('clustered_repeats'):
+        print(f"Near-duplicates merged: {METRICS.total('clustered_duplicates'):.0f}, "
+              f"repeats of earlier stories: {METRICS.total('clustered_repeats'):.0f} "
+              f"({METRICS.total('clustered_dropped'):.0f} dropped)")
+    stages = ('connect', 'download', 'parse', 'match', 'db', 'cluster')
+    print("Stage ms: " + ", ".join(f"{stage} {METRICS.stage_seconds(stage) * 1000:.0f}" for stage in stages))
+    fetch_times = {feed: seconds for (stage, feed), seconds in METRICS.timers.items() if stage == 'fetch' and feed}
+    if fetch_times:
+        slowest = max(fetch_times, key=fetch_times.get)
+        print(f"Slowest feed: {slowest} ({fetch_times[slowest]:.1f}s)")
+
+# Near-duplicate clustering (MinHash over word shingles, LSH banding)
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                      # 16 bands x 4 rows: candidates from ~0.5 similarity up
+SHINGLE_WORDS = 3
+CLUSTER_THRESHOLD = float(os.environ.get('CLUSTER_THRESHOLD', '0.5'))   # min estimated Jaccard similarity
+CLUSTER_HISTORY_DAYS = int(os.environ.get('CLUSTER_HISTORY_DAYS', '7'))  # match against earlier runs (0 = off)
+# Stricter bar for dropping an article as a repeat of an earlier run's story
+CLUSTER_HISTORY_THRESHOLD = float(os.environ.get('CLUSTER_HISTORY_THRESHOLD', '0.8'))
+
+_MERSENNE_61 = (1 << 61) - 1
+_rng = random.Random(20251116)
+_MINHASH_PARAMS = [(_rng.randrange(1, _MERSENNE_61), _rng.randrange(0, _MERSENNE_61))
+                   for _ in range(MINHASH_PERMUTATIONS)]
+del _rng
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def article_shingles(title: str, summary: str) -> Set[int]:
+    """Hashed word shingles of the title and the start of the (HTML-stripped) summary"""
+    words = _WORD_RE.findall(f"{title} {_TAG_RE.sub(' ', summary or '')}".lower())[:60]
+    if len(words) < SHINGLE_WORDS:
+        words = words + [''] * (SHINGLE_WORDS - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode(), digest_size=8).digest(), 'little')
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+def minhash_signature(shingles: Set[int]) -> array:
+    """MinHash signature: the minimum of each hash permutation over the shingles"""
+    return array('I', (
+        min((a * x + b) % _MERSENNE_61 for x in shingles) & 0xffffffff
+        for a, b in _MINHASH_PARAMS
+    ))
+
+def lsh_buckets(signature: array) -> List[Tuple[int, int]]:
+    """(band, bucket) pairs; articles sharing any pair are clustering candidates"""
+    rows = len(signature) // LSH_BANDS
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                              digest_size=8).digest(), 'little', signed=True))
+        for band in range(LSH_BANDS)
+    ]
+
+def signature_similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def _history_candidates(buckets: List[Tuple[int, int]], since: str) -> Dict[str, array]:
+    """Stored signatures sharing an LSH bucket with `buckets` (index lookups only)"""
+    conn = get_db()
+    clause = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in buckets)
+    params = [value for pair in buckets for value in pair]
+    rows = conn.execute(f'''
+        SELECT DISTINCT s.key, s.signature FROM lsh_buckets b
+        JOIN article_signatures s ON s.key = b.key
+        WHERE ({clause}) AND s.seen_date >= ?
+    ''', params + [since])
+    return {key: array('I', blob) for key, blob in rows}
+
+def prune_cluster_history(days: int = CLUSTER_HISTORY_DAYS) -> int:
+    """Delete signatures (and their LSH buckets) too old for cluster_articles to match against.
+
+    Independent of article retention: only the last `days` are ever queried.
+    Returns the number of signatures deleted.
+    """
+    cutoff = (datetime.now() - timedelta(days=max(days, 0))).isoformat()
+    with get_db() as conn:
+        conn.execute("DELETE FROM lsh_buckets WHERE key IN "
+                     "(SELECT key FROM article_signatures WHERE seen_date < ?)", (cutoff,))
+        return conn.execute("DELETE FROM article_signatures WHERE seen_date < ?", (cutoff,)).rowcount
+
+def _add_also_reported(lead: Dict, article: Dict):
+    lead.setdefault('also_reported', []).append(
+        {'source': article['source'], 'title': article['title'], 'link': article['link']})
+
+def cluster_articles(articles: List[Dict], history_days: int = CLUSTER_HISTORY_DAYS) -> List[Dict]:
+    """Group near-duplicate articles (the same story syndicated by several feeds).
+
+    The first article of each group stays in the digest and lists the other
+    sources under 'also_reported'. Articles matching a story stored by an
+    earlier run (at CLUSTER_HISTORY_THRESHOLD) are folded into it: added to
+    its queued digest entry if it is still pending, otherwise dropped as
+    already reported and logged. Signatures of all new articles are stored
+    for later runs.
+    """
     if not articles:
-        html = """
+        return articles
+    with METRICS.timer('cluster'):
+        return _cluster_articles(articles, history_days)
+
+def _cluster_articles(articles: List[Dict], history_days: int) -> List[Dict]:
+    since = (datetime.now() - timedelta(days=history_days)).isoformat()
+    pending_keys = set(row[0] for row in get_db().execute("SELECT key FROM pending_digest"))
+    batch_buckets = {}  # (band, bucket) -> [index into leads]
+    leads = []          # (article, signature)
+    history_updates = {}
+    rows = []
+    seen_date = datetime.now().isoformat()
+
+    for article in articles:
+        signature = minhash_signature(article_shingles(article['title'], article['summary']))
+        buckets = lsh_buckets(signature)
+        rows.append((article['key'], signature, buckets))
+
+        # Same story earlier in this batch?
+        candidates = {i for pair in buckets for i in batch_buckets.get(pair, ())}
+        best = max(candidates, key=lambda i: signature_similarity(signature, leads[i][1]), default=None)
+        if best is not None and signature_similarity(signature, leads[best][1]) >= CLUSTER_THRESHOLD:
+            _add_also_reported(leads[best][0], article)
+            METRICS.incr('clustered_duplicates')
+            continue
+
+        # Same story from an earlier run?
+        if history_days > 0:
+            history = _history_candidates(buckets, since)
+            match = max(history, key=lambda i: signature_similarity(signature, history[i]), default=None)
+            if match is not None and signature_similarity(signature, history[match]) >= CLUSTER_HISTORY_THRESHOLD:
+                if match in pending_keys:
+                    history_updates.setdefault(match, []).append(article)
+                else:
+                    print(f"  {article['source']}: already reported, dropped: {article['title'][:80]}")
+                    METRICS.incr('clustered_dropped')
+                METRICS.incr('clustered_repeats')
+                continue
+
+        for pair in buckets:
+            batch_buckets.setdefault(pair, []).append(len(leads))
+        leads.append((article, signature))
+
+    with get_db() as conn:
+        conn.executemany("INSERT OR IGNORE INTO article_signatures (key, signature, seen_date) VALUES (?, ?, ?)",
+                         [(key, signature.tobytes(), seen_date) for key, signature, _ in rows])
+        conn.executemany("INSERT OR IGNORE INTO lsh_buckets (band, bucket, key) VALUES (?, ?, ?)",
+                         [(band, bucket, key) for key, _, buckets in rows for band, bucket in buckets])
+        for lead_key, duplicates in history_updates.items():
+            (payload,) = conn.execute("SELECT payload FROM pending_digest WHERE key = ?", (lead_key,)).fetchone()
+            lead = json.loads(payload)
+            for article in duplicates:
+                _add_also_reported(lead, article)
+            conn.execute("UPDATE pending_digest SET payload = ? WHERE key = ?",
+                         (json.dumps(lead, ensure_ascii=False), lead_key))
+
+    return [article for article, _ in leads]
+
+# Digest rendering limits (0 = unlimited)
+DIGEST_PER_SOURCE = int(os.environ.get('DIGEST_PER_SOURCE', '0'))  # max articles shown per source
+DIGEST_TOP_N = int(os.environ.get('DIGEST_TOP_N', '0'))            # max articles shown overall
+DIGEST_PLAIN_TEXT = os.environ.get('DIGEST_PLAIN_TEXT', '0') == '1'  # add a text/plain part to the email
+
+_EMPTY_DIGEST_HTML = """
         <html>
         <body>
             <h2>Defence & Security Intelligence Digest</h2>
@@ -230,18 +1987,9 @@ def generate_html_digest(articles: List[Dict]) -> str:
             <p>No new articles matching your keywords today.</p>
         </body>
         </html>
-        """.format(date=datetime.now().strftime("%d %B %Y"))
-        return html
-    
-    # Group by source
-    by_source = {}
-    for article in articles:
-        source = article['source']
-        if source not in by_source:
-            by_source[source] = []
-        by_source[source].append(article)
-    
-    html = """
+        """
+
+_DIGEST_HEAD_HTML = """
     <html>
     <head>
         <style>
@@ -293,138 +2041,1147 @@ def generate_html_digest(articles: List[Dict]) -> str:
         <div class="stats">
             <strong>{count} new articles</strong> across {sources} sources
         </div>
-    """.format(
-        date=datetime.now().strftime("%d %B %Y"),
-        count=len(articles),
-        sources=len(by_source)
-    )
-    
-    # Add articles grouped by source
-    for source in sorted(by_source.keys()):
-        html += f"\n        <h3>{source} ({len(by_source[source])})</h3>"
-        
-        for article in by_source[source]:
-            keywords_str = ", ".join(article['matched_keywords'][:5])  # Show first 5 matches
-            if len(article['matched_keywords']) > 5:
-                keywords_str += f" +{len(article['matched_keywords']) - 5} more"
-            
-            html += f"""
+    """
+
+_DIGEST_ARTICLE_HTML = """
         <div class="article">
             <div class="article-title">
-                <a href="{article['link']}" target="_blank">{article['title']}</a>
+                <a href="{link}" target="_blank">{title}</a>
             </div>
-            <div class="article-meta">{article['published']}</div>
-            <div class="article-summary">{article['summary']}</div>
-            <div class="keywords">Matched: {keywords_str}</div>
+            <div class="article-meta">{published}</div>{also_reported}
+            <div class="article-summary">{summary}</div>
+            <div class="keywords">Matched: {keywords}</div>
         </div>
             """
-    
-    html += """
+
+_DIGEST_TAIL_HTML = """
     </body>
     </html>
     """
-    
-    return html
-
-def send_email_digest(html_content: str, recipient_email: str):
-    """Send email digest via SMTP"""
-
-    # Email configuration from environment variables
-    smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-    sender_email = os.environ.get('SENDER_EMAIL', '').strip()
-    sender_password = os.environ.get('SENDER_PASSWORD', '').replace(' ', '').replace('\xa0', '').strip()
-
-    print(f"\n[EMAIL CONFIG]")
-    print(f"  SMTP Server: {smtp_server}")
-    print(f"  SMTP Port: {smtp_port}")
-    print(f"  Sender Email: {sender_email if sender_email else 'NOT SET'}")
-    print(f"  Sender Password: {'SET' if sender_password else 'NOT SET'}")
-    print(f"  Recipient Email: {recipient_email}")
-
-    if not sender_email or not sender_password:
-        print("ERROR: Email credentials not set. Set SENDER_EMAIL and SENDER_PASSWORD environment variables.")
-        print("\nHTML digest preview:")
-        print(html_content)
-        raise ValueError("Email credentials not configured")
-    
-    # Create message
+
+# Relevance scoring (weights in scoring.json)
+SCORING_CONFIG = os.environ.get('SCORING_CONFIG') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'scoring.json')
+
+DEFAULT_SCORING = {
+    'default_weight': 1.0,          # weight of keywords not listed under 'keywords'
+    'title_multiplier': 2.0,        # a keyword found in the title counts this many times
+    'distinct_keyword_bonus': 0.5,  # added per matched keyword beyond the first
+    'recency_half_life_hours': 72,  # recency part of the score halves every this many hours
+    'recency_weight': 0.5,          # share of the score that decays with age (0 = ignore dates)
+    'top_n': 0,                     # keep only the N best articles overall (0 = all)
+    'top_n_per_source': 0,          # keep only the N best articles per source (0 = all)
+    'groups': {},                   # keyword group -> weight for every keyword in it
+    'keywords': {},                 # keyword -> weight (case-insensitive), overrides its group
+}
+
+def load_scoring_config(path: str = SCORING_CONFIG) -> Dict:
+    """Scoring weights from a JSON file, falling back to DEFAULT_SCORING"""
+    config = dict(DEFAULT_SCORING)
+    try:
+        with open(path, encoding='utf-8') as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    weights = {}
+    for group, weight in config['groups'].items():
+        for keyword in KEYWORD_GROUPS.get(group, []):
+            weights[keyword.lower()] = float(weight)
+    weights.update((k.lower(), float(v)) for k, v in config['keywords'].items())
+    config['keywords'] = weights
+    return config
+
+def parse_published(published: str) -> Optional[datetime]:
+    """Parse an RSS (RFC 822) or Atom (ISO 8601) date; None if unparseable"""
+    if not published:
+        return None
+    import email.utils
+    try:
+        parsed = email.utils.parsedate_to_datetime(published)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(published.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def score_article(article: Dict, config: Dict, now: datetime = None) -> float:
+    """Relevance score from keyword weights, title hits, keyword count and recency"""
+    weights = config['keywords']
+    title_hits = set(matches_keywords(article['title'], KEYWORDS))
+    score = 0.0
+    for keyword in article['matched_keywords']:
+        weight = weights.get(keyword.lower(), config['default_weight'])
+        score += weight * (config['title_multiplier'] if keyword in title_hits else 1)
+    distinct = len({keyword.lower() for keyword in article['matched_keywords']})
+    score += config['distinct_keyword_bonus'] * max(0, distinct - 1)
+
+    published = parse_published(article.get('published', ''))
+    if published and config['recency_half_life_hours']:
+        now = now or datetime.now(timezone.utc)
+        age_hours = max(0.0, (now - published).total_seconds() / 3600)
+        decay = 0.5 ** (age_hours / config['recency_half_life_hours'])
+        score *= 1 - config['recency_weight'] + config['recency_weight'] * decay
+    return round(score, 2)
+
+def score_articles(articles: Iterator[Dict], config: Dict = None) -> Iterator[Dict]:
+    """Attach a 'score' to every article (lazily, so it can feed select_top_articles)"""
+    config = config or load_scoring_config()
+    now = datetime.now(timezone.utc)
+    for article in articles:
+        article['score'] = score_article(article, config, now)
+        yield article
+
+class TopArticles:
+    """Bounded heaps holding the best articles added so far (see select_top_articles)"""
+
+    def __init__(self, top_n: int = 0, per_source: int = 0):
+        self.top_n = top_n
+        self.per_source = per_source
+        self.totals = Counter()
+        self.heaps = {}  # source (or None for a single overall heap) -> [(score, -seq, article)]
+        self.kept = []
+        self.seq = 0
+
+    def add(self, article: Dict):
+        seq = self.seq
+        self.seq += 1
+        self.totals[article['source']] += 1
+        if not self.top_n and not self.per_source:
+            self.kept.append((0, -seq, article))
+            return
+        heap = self.heaps.setdefault(article['source'] if self.per_source else None, [])
+        item = (article.get('score', 0), -seq, article)
+        if len(heap) < (self.per_source or self.top_n):
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    def result(self) -> Tuple[List[Dict], Counter]:
+        kept = self.kept
+        if self.heaps:
+            kept = [item for heap in self.heaps.values() for item in heap]
+            if self.top_n and len(kept) > self.top_n:
+                kept = heapq.nlargest(self.top_n, kept, key=lambda item: item[:2])
+        kept.sort(key=lambda item: -item[1])
+        return [article for _, _, article in kept], self.totals
+
+def select_top_articles(articles: Iterator[Dict], top_n: int = 0,
+                        per_source: int = 0) -> Tuple[List[Dict], Counter]:
+    """Keep the best articles using bounded heaps, so memory does not grow with the input.
+
+    per_source keeps the N highest-scoring articles of each source, then top_n
+    keeps the N best of those overall (0 = no limit). Ties, and articles
+    without a 'score', keep their input order. Returns the kept articles in
+    input order and the number of articles seen per source.
+    """
+    top = TopArticles(top_n, per_source)
+    for article in articles:
+        top.add(article)
+    return top.result()
+
+def select_digest_articles(articles: List[Dict], per_source: int = 0, top_n: int = 0,
+                           totals: Counter = None) -> Tuple[Dict[str, List[Dict]], Counter]:
+    """Group articles by source and apply the digest limits.
+
+    Returns the shown articles per source and the total number of articles per
+    source (`totals` when the articles were already selected upstream).
+    """
+    shown, counted = select_top_articles(articles, top_n, per_source)
+    by_source = {}
+    for article in shown:
+        by_source.setdefault(article['source'], []).append(article)
+    return by_source, totals or counted
+
+def _meta_label(article: Dict) -> str:
+    if 'score' not in article:
+        return article['published']
+    return f"{article['published']} | Score: {article['score']:.1f}"
+
+def _also_reported_html(article: Dict) -> str:
+    others = article.get('also_reported')
+    if not others:
+        return ""
+    links = ", ".join(f'<a href="{other["link"]}" target="_blank">{other["source"]}</a>' for other in others)
+    return f'\n            <div class="article-meta">Also reported by: {links}</div>'
+
+def _keywords_label(matched_keywords: List[str]) -> str:
+    keywords_str = ", ".join(matched_keywords[:5])  # Show first 5 matches
+    if len(matched_keywords) > 5:
+        keywords_str += f" +{len(matched_keywords) - 5} more"
+    return keywords_str
+
+def _health_note(feed: Dict) -> str:
+    if feed['skip_runs']:
+        runs = "run" if feed['skip_runs'] == 1 else f"{feed['skip_runs']} runs"
+        return f"failed {feed['failures']} times in a row, skipped for the next {runs}"
+    return "failed on the last fetch" if feed['failures'] == 1 else f"failed {feed['failures']} times in a row"
+
+def _health_footer_html(health: Dict) -> str:
+    """Footer listing failing feeds (see feed_health_report)"""
+    from html import escape
+
+    style = "color: #7f8c8d; font-size: 12px; border-top: 1px solid #ddd; margin-top: 30px; padding-top: 10px;"
+    failing = health['failing']
+    if not failing:
+        return f'\n        <p style="{style}">All {health["total"]} sources fetched normally.</p>'
+    items = "".join(f"<li>{escape(feed['source'])}: {escape(feed['last_error'] or 'error')} ({_health_note(feed)})</li>"
+                    for feed in failing)
+    return (f'\n        <div style="{style}">Feed health: {health["total"] - len(failing)} of {health["total"]} '
+            f'sources OK. Not reporting:<ul>{items}</ul></div>')
+
+def iter_html_digest(articles: List[Dict], per_source: int = DIGEST_PER_SOURCE,
+                     top_n: int = DIGEST_TOP_N, totals: Counter = None, health: Dict = None) -> Iterator[str]:
+    """Yield the HTML email digest in chunks (one per article).
+
+    `totals` gives the number of matches per source when `articles` is
+    already a selection (see select_top_articles), for the counts shown.
+    `health` (from feed_health_report) adds a footer on failing feeds.
+    """
+    date = datetime.now().strftime("%d %B %Y")
+    if not articles:
+        empty = _EMPTY_DIGEST_HTML.format(date=date)
+        if health is not None:
+            empty = empty.replace("        </body>", _health_footer_html(health) + "\n        </body>", 1)
+        yield empty
+        return
+
+    by_source, totals = select_digest_articles(articles, per_source, top_n, totals)
+    yield _DIGEST_HEAD_HTML.format(date=date, count=sum(totals.values()), sources=len(totals))
+
+    # Add articles grouped by source
+    for source in sorted(by_source):
+        shown = by_source[source]
+        if len(shown) == totals[source]:
+            yield f"\n        <h3>{source} ({len(shown)})</h3>"
+        else:
+            yield f"\n        <h3>{source} ({len(shown)} of {totals[source]})</h3>"
+
+        for article in shown:
+            yield _DIGEST_ARTICLE_HTML.format(
+                link=article['link'],
+                title=article['title'],
+                published=_meta_label(article),
+                also_reported=_also_reported_html(article),
+                summary=article['summary'],
+                keywords=_keywords_label(article['matched_keywords']),
+            )
+
+    if health is not None:
+        yield _health_footer_html(health)
+    yield _DIGEST_TAIL_HTML
+
+def _health_footer_text(health: Dict) -> str:
+    failing = health['failing']
+    if not failing:
+        return f"\nAll {health['total']} sources fetched normally.\n"
+    lines = "".join(f"  - {feed['source']}: {feed['last_error'] or 'error'} ({_health_note(feed)})\n"
+                    for feed in failing)
+    return f"\nFeed health: {health['total'] - len(failing)} of {health['total']} sources OK. Not reporting:\n{lines}"
+
+def iter_text_digest(articles: List[Dict], per_source: int = DIGEST_PER_SOURCE,
+                     top_n: int = DIGEST_TOP_N, totals: Counter = None, health: Dict = None) -> Iterator[str]:
+    """Yield a plain-text version of the digest, for the text/plain email part"""
+    yield f"Defence & Security Intelligence Digest\n{datetime.now().strftime('%d %B %Y')}\n\n"
+    if not articles:
+        yield "No new articles matching your keywords today.\n"
+        if health is not None:
+            yield _health_footer_text(health)
+        return
+
+    by_source, totals = select_digest_articles(articles, per_source, top_n, totals)
+    yield f"{sum(totals.values())} new articles across {len(totals)} sources\n"
+    for source in sorted(by_source):
+        shown = by_source[source]
+        count = f"{len(shown)}" if len(shown) == totals[source] else f"{len(shown)} of {totals[source]}"
+        yield f"\n{source} ({count})\n{'-' * (len(source) + len(count) + 3)}\n"
+        for article in shown:
+            yield (f"\n* {article['title']}\n"
+                   f"  {article['link']}\n"
+                   f"  {_meta_label(article)}\n"
+                   f"  Matched: {_keywords_label(article['matched_keywords'])}\n")
+            if article.get('also_reported'):
+                yield f"  Also reported by: {', '.join(o['source'] for o in article['also_reported'])}\n"
+    if health is not None:
+        yield _health_footer_text(health)
+
+def write_digest(chunks: Iterator[str], fp: TextIO) -> int:
+    """Write rendered chunks to a file or buffer as they are produced; returns characters written"""
+    written = 0
+    for chunk in chunks:
+        written += fp.write(chunk)
+    return written
+
+def generate_html_digest(articles: List[Dict]) -> str:
+    """Generate HTML email digest"""
+    return "".join(iter_html_digest(articles))
+
+# SMTP delivery; server and credentials come from SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'                 # 0 for a plain local test server
+SMTP_AUTH = os.environ.get('SMTP_AUTH', '1') == '1'                         # 0 to skip login
+SMTP_RETRIES = int(os.environ.get('SMTP_RETRIES', '3'))                      # per message, after the first try
+SMTP_MAX_PER_MINUTE = float(os.environ.get('SMTP_MAX_PER_MINUTE', '20'))    # send rate cap (0 = none)
+
+def _smtp_transient(error: Exception) -> bool:
+    """True for failures worth reconnecting and retrying (dropped connection, 4xx replies)"""
+    import smtplib
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class SMTPSender:
+    """One authenticated SMTP session reused for every message of a run.
+
+    Connects (STARTTLS and login) on the first send. A dropped connection or
+    temporary 4xx reply closes the session, backs off exponentially and
+    retries on a fresh one, up to SMTP_RETRIES times. Sends are spaced to
+    stay under SMTP_MAX_PER_MINUTE.
+    """
+
+    def __init__(self):
+        self.server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+        self.port = int(os.environ.get('SMTP_PORT', '587'))
+        self.sender_email = os.environ.get('SENDER_EMAIL', '').strip()
+        self.password = os.environ.get('SENDER_PASSWORD', '').replace(' ', '').replace('\xa0', '').strip()
+        self.smtp = None
+        self._last_send = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.sender_email and (self.password or not SMTP_AUTH))
+
+    def print_config(self, recipients: List[str]):
+        print(f"\n[EMAIL CONFIG]")
+        print(f"  SMTP Server: {self.server}")
+        print(f"  SMTP Port: {self.port}")
+        print(f"  Sender Email: {self.sender_email if self.sender_email else 'NOT SET'}")
+        print(f"  Sender Password: {'SET' if self.password else 'NOT SET'}")
+        print(f"  Recipient Email: {', '.join(recipients)}")
+
+    def connect(self):
+        print(f"\n[EMAIL SENDING]")
+        print(f"  Connecting to {self.server}:{self.port}...")
+        import smtplib
+        smtp = smtplib.SMTP(self.server, self.port, timeout=30)
+        try:
+            if SMTP_STARTTLS:
+                print(f"  Starting TLS...")
+                smtp.starttls()
+            if SMTP_AUTH:
+                print(f"  Logging in as {self.sender_email}...")
+                smtp.login(self.sender_email, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self.smtp = smtp
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except OSError:  # includes smtplib.SMTPException
+            self.smtp.close()
+        self.smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def send(self, msg: 'MIMEMultipart'):
+        if SMTP_MAX_PER_MINUTE > 0 and self._last_send is not None:
+            wait = self._last_send + 60 / SMTP_MAX_PER_MINUTE - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        for attempt in range(SMTP_RETRIES + 1):
+            try:
+                if self.smtp is None:
+                    self.connect()
+                self.smtp.send_message(msg)
+                break
+            except Exception as e:
+                if not _smtp_transient(e) or attempt == SMTP_RETRIES:
+                    raise
+                print(f"  SMTP error ({e}), reconnecting and retrying in {2 ** attempt}s...")
+                METRICS.incr('smtp_retries')
+                if self.smtp is not None:
+                    self.smtp.close()
+                    self.smtp = None
+                time.sleep(2 ** attempt)
+        self._last_send = time.monotonic()
+        METRICS.incr('emails_sent')
+
+def build_digest_message(sender_email: str, recipient_email: str, html_content: str,
+                         text_content: str = None, title: str = None) -> 'MIMEMultipart':
+    """The digest email (with an optional plain-text alternative part)"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     msg = MIMEMultipart('alternative')
     msg['Subject'] = f"Defence Intelligence Digest - {datetime.now().strftime('%d %B %Y')}"
+    if title:
+        msg['Subject'] += f" - {title}"
     msg['From'] = sender_email
     msg['To'] = recipient_email
-    
+
+    # Plain-text part first: clients show the last alternative they support
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain'))
+
     # Attach HTML content
     html_part = MIMEText(html_content, 'html')
     msg.attach(html_part)
-    
-    try:
-        # Send email
-        print(f"\n[EMAIL SENDING]")
-        print(f"  Connecting to {smtp_server}:{smtp_port}...")
-        with smtplib.SMTP(smtp_server, smtp_port, timeout=30) as server:
-            print(f"  Starting TLS...")
-            server.starttls()
-            print(f"  Logging in as {sender_email}...")
-            server.login(sender_email, sender_password)
-            print(f"  Sending message...")
-            server.send_message(msg)
-
-        print(f"\n✓ Email digest sent successfully to {recipient_email}")
-
-    except smtplib.SMTPAuthenticationError as e:
+    return msg
+
+def _print_smtp_error(e: Exception, sender: SMTPSender):
+    import smtplib
+    if isinstance(e, smtplib.SMTPAuthenticationError):
         print(f"\n✗ SMTP Authentication Error: {e}")
         print("  Check that your Gmail App Password is correct (16 characters)")
         print("  Verify 2-Step Verification is enabled in Google Account")
-        raise
-    except smtplib.SMTPException as e:
+    elif isinstance(e, smtplib.SMTPException):
         print(f"\n✗ SMTP Error: {e}")
-        print(f"  Server: {smtp_server}:{smtp_port}")
-        raise
-    except Exception as e:
+        print(f"  Server: {sender.server}:{sender.port}")
+    else:
         print(f"\n✗ Unexpected error sending email: {type(e).__name__}: {e}")
-        raise
 
-def main():
-    """Main execution function"""
+def _credentials_missing(html_content: str):
+    print("ERROR: Email credentials not set. Set SENDER_EMAIL and SENDER_PASSWORD environment variables.")
+    print("\nHTML digest preview:")
+    print(html_content)
+    raise ValueError("Email credentials not configured")
+
+# Subscriber profiles: who gets which part of the digest
+SUBSCRIBERS_CONFIG = os.environ.get('SUBSCRIBERS_CONFIG') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'subscribers.json')
+
+def load_subscribers(path: str = SUBSCRIBERS_CONFIG) -> List[Dict]:
+    """Subscriber profiles from a JSON file; without one, everything goes to RECIPIENT_EMAIL.
+
+    A profile's keyword filter is the union of its 'groups' (keyword groups of
+    monitor_config.json) and 'keywords'; empty means every keyword. 'sources'
+    limits it to those feeds.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {'profiles': [{'recipients': [os.environ.get('RECIPIENT_EMAIL', 'your-email@example.com')]}]}
+
+    known = {keyword.lower() for keyword in KEYWORDS}
+    profiles = []
+    for item in data['profiles']:
+        name = item.get('name', '')
+        keywords = set()
+        for group in item.get('groups', []):
+            if group not in KEYWORD_GROUPS:
+                print(f"  Profile {name!r}: unknown keyword group {group!r}, ignored")
+            keywords.update(keyword.lower() for keyword in KEYWORD_GROUPS.get(group, []))
+        for keyword in item.get('keywords', []):
+            if keyword.lower() not in known:
+                print(f"  Profile {name!r}: {keyword!r} is not in the monitored keywords and will never match")
+            keywords.add(keyword.lower())
+        profiles.append({
+            'name': name,
+            'recipients': list(item['recipients']),
+            'keywords': keywords or None,
+            'sources': set(item['sources']) if item.get('sources') else None,
+            'top_n': int(item.get('top_n', 0)),
+            'top_n_per_source': int(item.get('top_n_per_source', 0)),
+            'skip_empty': bool(item.get('skip_empty', False)),
+        })
+    return profiles
+
+def profile_article(article: Dict, profile: Dict) -> Optional[Dict]:
+    """The article as one profile sees it (None if filtered out), reusing the keyword hits found while matching.
+
+    With a keyword filter, the article is kept if any of its matched keywords
+    is in the profile, and shows only those.
+    """
+    keywords = profile['keywords']
+    sources = profile['sources']
+    if sources is not None and article['source'] not in sources:
+        return None
+    if keywords is None:
+        return article
+    hits = [keyword for keyword in article['matched_keywords'] if keyword.lower() in keywords]
+    return dict(article, matched_keywords=hits) if hits else None
+
+def select_digests(articles: Iterator[Dict], profiles: List[Dict],
+                   config: Dict) -> Tuple[List[Tuple[List[Dict], Counter]], int]:
+    """Score a stream of articles and keep every profile's best in one pass.
+
+    Only the selected articles are held, not the stream. Returns each
+    profile's (articles, totals per source) and the number of articles read.
+    """
+    selectors = [TopArticles(DIGEST_TOP_N or profile['top_n'] or config['top_n'],
+                             DIGEST_PER_SOURCE or profile['top_n_per_source'] or config['top_n_per_source'])
+                 for profile in profiles]
+    count = 0
+    for article in score_articles(articles, config):
+        count += 1
+        for profile, top in zip(profiles, selectors):
+            shown = profile_article(article, profile)
+            if shown is not None:
+                top.add(shown)
+    return [top.result() for top in selectors], count
+
+def render_digest(selected: List[Dict], totals: Counter, health: Dict = None) -> Tuple[str, Optional[str]]:
+    """Render one selected digest: (html, text or None)"""
+    with METRICS.timer('render'):
+        buffer = io.StringIO()
+        write_digest(iter_html_digest(selected, per_source=0, top_n=0, totals=totals, health=health), buffer)
+        text = ("".join(iter_text_digest(selected, per_source=0, top_n=0, totals=totals, health=health))
+                if DIGEST_PLAIN_TEXT else None)
+    return buffer.getvalue(), text
+
+def deliver_digest(all_articles: Iterator[Dict], health: Dict = None):
+    """Score the articles once, then render and email each subscriber profile's digest.
+
+    `all_articles` is read once, as it streams in (see select_digests).
+    `health` (from feed_health_report) adds the feed health footer.
+    """
+    profiles = load_subscribers()
+    digests, _ = select_digests(all_articles, profiles, load_scoring_config())
+    send_digests(profiles, digests, health)
+
+def send_digests(profiles: List[Dict], digests: List[Tuple[List[Dict], Counter]], health: Dict = None):
+    """Render and email each profile's selected digest (from select_digests).
+
+    Every message goes out over one SMTP session. A failed recipient is
+    reported and skipped; the call only raises if nothing could be sent.
+    The first profile's digest is saved to latest_digest.html.
+    """
+    import smtplib
+
+    sender = SMTPSender()
+    sender.print_config([r for profile in profiles for r in profile['recipients']])
+
+    sent, failed = 0, []
+    with sender:
+        for number, (profile, (selected, totals)) in enumerate(zip(profiles, digests)):
+            html_digest, text_digest = render_digest(selected, totals, health)
+            shown = len(selected)
+            METRICS.incr('digest_articles', shown)
+            if number == 0:
+                if not sender.configured:
+                    _credentials_missing(html_digest)
+                # Save HTML digest to file for review (optional, may fail in some environments)
+                try:
+                    digest_path = 'latest_digest.html'
+                    with open(digest_path, 'w', encoding='utf-8') as f:
+                        f.write(html_digest)
+                    print(f"✓ Digest saved to {digest_path}")
+                except Exception as e:
+                    print(f"Note: Could not save digest file ({e})")
+            if not shown and profile['skip_empty']:
+                continue
+
+            for recipient in profile['recipients']:
+                print(f"\n[RECIPIENT] {recipient}" + (f" ({profile['name']}, {shown} articles)" if profile['name'] else ""))
+                msg = build_digest_message(sender.sender_email, recipient, html_digest, text_digest,
+                                           profile['name'])
+                try:
+                    with METRICS.timer('smtp'):
+                        sender.send(msg)
+                    sent += 1
+                    print(f"✓ Email digest sent successfully to {recipient}")
+                except Exception as e:
+                    _print_smtp_error(e, sender)
+                    if isinstance(e, smtplib.SMTPAuthenticationError):
+                        raise
+                    METRICS.incr('emails_failed')
+                    failed.append(recipient)
+
+    if failed:
+        print(f"\n✗ Digest not delivered to {len(failed)} recipients: {', '.join(failed)}")
+        if not sent:
+            raise RuntimeError("Digest could not be sent to any recipient")
+
+def run_once():
+    """One-shot run: fetch every feed, then send the digest"""
     print(f"\n{'='*60}")
     print(f"Defence & Security News Monitor - {datetime.now().strftime('%d %B %Y %H:%M')}")
     print(f"{'='*60}\n")
     
-    # Initialize database
-    init_db()
-    
-    # Fetch all feeds
-    all_articles = []
-    for source_name, feed_url in RSS_FEEDS.items():
-        articles = fetch_feed(source_name, feed_url)
-        all_articles.extend(articles)
-        time.sleep(1)  # Be polite to servers
-    
-    print(f"\n{'='*60}")
-    print(f"Total new articles found: {len(all_articles)}")
-    print(f"{'='*60}\n")
-    
-    # Generate and send digest
-    html_digest = generate_html_digest(all_articles)
+    METRICS.reset()
+    try:
+        with METRICS.timer('total'):
+            # Initialize database
+            ensure_monitor_config()
+            init_db()
+            load_seen_index()
 
-    recipient = os.environ.get('RECIPIENT_EMAIL', 'your-email@example.com')
-    print(f"\n[RECIPIENT] {recipient}")
+            # Fetch all feeds concurrently (politeness is enforced per host); new
+            # articles stream straight into each profile's bounded selection
+            profiles = load_subscribers()
+            try:
+                new_articles = chain.from_iterable(iter_clustered_batches(iter_fetch_feeds(RSS_FEEDS)))
+                digests, total_new = select_digests(new_articles, profiles, load_scoring_config())
+                run_maintenance()
+                health = feed_health_report(RSS_FEEDS)
+            finally:
+                # Checkpoint the WAL so defence_news.db is complete even if sending fails
+                close_db()
 
-    send_email_digest(html_digest, recipient)
+            print(f"\n{'='*60}")
+            print(f"Total new articles found: {total_new}")
+            print_run_stats()
+            print(f"{'='*60}\n")
 
-    # Save HTML digest to file for review (optional, may fail in some environments)
-    try:
-        digest_path = 'latest_digest.html'
-        with open(digest_path, 'w', encoding='utf-8') as f:
-            f.write(html_digest)
-        print(f"✓ Digest saved to {digest_path}")
-    except Exception as e:
-        print(f"Note: Could not save digest file ({e})")
+            send_digests(profiles, digests, health)
+    finally:
+        write_metrics()
 
     print(f"\n{'='*60}")
     print("✓ Defence News Monitor completed successfully")
     print(f"{'='*60}\n")
 
+# Daemon polling (seconds)
+POLL_MIN = int(os.environ.get('POLL_MIN', '300'))          # busiest feeds: every 5 minutes
+POLL_MAX = int(os.environ.get('POLL_MAX', '21600'))        # quietest feeds: every 6 hours
+POLL_INITIAL = int(os.environ.get('POLL_INITIAL', '1800'))
+POLL_JITTER = 0.1                                          # +/- 10% on every interval
+DIGEST_RETRY_MIN = int(os.environ.get('DIGEST_RETRY_MIN', '60'))    # first retry of a failed digest send, doubling
+DIGEST_RETRY_MAX = int(os.environ.get('DIGEST_RETRY_MAX', '3600'))  # longest wait between send retries
+
+class ConfigWatcher:
+    """Notices edits to the monitor config file by its modification time"""
+
+    def __init__(self, path: str = MONITOR_CONFIG):
+        self.path = path
+        self.mtime = self._mtime()
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self) -> Optional[Dict]:
+        """The new config if the file changed since the last poll, else None.
+
+        A file that fails to load (e.g. caught mid-save) is reported and the
+        current config kept; the next save changes the mtime again.
+        """
+        mtime = self._mtime()
+        if mtime is None or mtime == self.mtime:
+            return None
+        self.mtime = mtime
+        try:
+            return load_monitor_config(self.path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Config {self.path} not reloaded, keeping the current one: {e}")
+            return None
+
+class FeedPoller:
+    """Adaptive poll interval for one feed.
+
+    The interval halves when a poll finds new matches, shrinks a little when
+    the feed changed without new matches and grows by half when the feed was
+    not modified, staying within POLL_MIN..POLL_MAX. Failures back off
+    exponentially from the current interval.
+    """
+
+    def __init__(self, source: str, url: str, interval: float = POLL_INITIAL):
+        self.source = source
+        self.url = url
+        self.interval = interval
+        self.failures = 0
+        self.next_due = 0.0  # poll on the first tick
+
+    def update(self, outcome: Dict, now: float):
+        if outcome['status'] == 'error':
+            self.failures += 1
+            delay = min(POLL_MAX, self.interval * 2 ** self.failures)
+        elif outcome['status'] in ('circuit_open', 'budget'):
+            delay = self.interval  # not polled this time; the breaker decides when it is tried again
+        else:
+            self.failures = 0
+            if outcome['new']:
+                self.interval *= 0.5
+            elif outcome['status'] == 'changed':
+                self.interval *= 0.9
+            else:
+                self.interval *= 1.5
+            self.interval = min(POLL_MAX, max(POLL_MIN, self.interval))
+            delay = self.interval
+        self.next_due = now + delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+def _parse_digest_times(value: str) -> List[Tuple[int, int]]:
+    times = []
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        hour, minute = item.split(':')
+        times.append((int(hour), int(minute)))
+    return times
+
+def _digest_due(digest_times: List[Tuple[int, int]], last_sent: datetime, now: datetime) -> bool:
+    """True when a scheduled digest time has passed since the last digest"""
+    for hour, minute in digest_times:
+        slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if slot > now:
+            slot -= timedelta(days=1)
+        if slot > last_sent:
+            return True
+    return False
+
+def reload_config(config: Dict, pollers: Dict[str, FeedPoller]) -> Dict[str, FeedPoller]:
+    """Switch to a reloaded config, keeping the poll schedule of unchanged feeds.
+
+    Conditional-GET state is keyed by URL in feed_cache, so it survives too;
+    only added feeds (or feeds whose URL changed) start from scratch.
+    """
+    keywords_changed = config['keywords'] != KEYWORDS
+    apply_monitor_config(config)
+    if keywords_changed:
+        _matcher_cache.clear()
+    kept = {name: poller for name, poller in pollers.items() if RSS_FEEDS.get(name) == poller.url}
+    added = [name for name in RSS_FEEDS if name not in kept]
+    for name in added:
+        kept[name] = FeedPoller(name, RSS_FEEDS[name])
+    print(f"Config reloaded: {len(RSS_FEEDS)} feeds ({len(added)} new or changed), {len(KEYWORDS)} keywords")
+    return {name: kept[name] for name in RSS_FEEDS}
+
+def run_daemon(digest_times: List[Tuple[int, int]], digest_threshold: int = 0, tick: float = 30):
+    """Long-running mode: poll each feed on its own schedule, send digests on another.
+
+    The DB connection, compiled matcher, TLS context and per-host throttle
+    stay warm between polls. New matches are queued in pending_digest and
+    sent at the fixed digest_times, or as soon as digest_threshold matches
+    are waiting. A failed send is retried, backing off from DIGEST_RETRY_MIN
+    up to DIGEST_RETRY_MAX seconds, until it goes out. Edits to
+    MONITOR_CONFIG are picked up on the next tick.
+    """
+    print(f"Defence & Security News Monitor daemon started - {datetime.now().strftime('%d %B %Y %H:%M')}")
+    ensure_monitor_config()
+    init_db()
+    load_seen_index()
+    throttle = HostThrottle()
+    pollers = {name: FeedPoller(name, url) for name, url in RSS_FEEDS.items()}
+    watcher = ConfigWatcher()
+    last_digest = datetime.now()
+    send_failures = 0
+    retry_at = 0.0
+    last_maintenance = 0.0
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    try:
+        while not stopping:
+            METRICS.reset()
+            config = watcher.poll()
+            if config:
+                pollers = reload_config(config, pollers)
+            now = time.time()
+            due = {p.source: p.url for p in pollers.values() if p.next_due <= now}
+            if due:
+                outcomes = {}
+                for batch in iter_clustered_batches(iter_fetch_feeds(due, throttle=throttle, outcomes=outcomes)):
+                    queue_for_digest(batch)
+                finished = time.time()
+                for source, outcome in outcomes.items():
+                    pollers[source].update(outcome, finished)
+
+            if now - last_maintenance > 86400:
+                run_maintenance()
+                last_maintenance = now
+
+            pending = count_pending_digest()
+            current = datetime.now()
+            if pending and time.time() >= retry_at and ((digest_threshold and pending >= digest_threshold)
+                                                        or _digest_due(digest_times, last_digest, current)):
+                up_to = last_pending_rowid()
+                print(f"\nSending digest with {pending} articles")
+                try:
+                    deliver_digest(iter_pending_digest(up_to), feed_health_report(RSS_FEEDS))
+                    clear_pending_digest(up_to)
+                except Exception as e:
+                    # Still due (last_digest unchanged), so retried once the backoff has passed
+                    delay = min(DIGEST_RETRY_MAX, DIGEST_RETRY_MIN * 2 ** send_failures)
+                    send_failures += 1
+                    retry_at = time.time() + delay
+                    print(f"  Digest not sent, retrying in {delay}s: {e}")
+                else:
+                    last_digest = current
+                    send_failures = 0
+                    retry_at = 0.0
+
+            if METRICS.counters or METRICS.timers:
+                write_metrics()
+
+            next_poll = min(p.next_due for p in pollers.values())
+            time.sleep(max(1.0, min(tick, next_poll - time.time())))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_db()
+        shutdown_parse_pool()
+        print("Daemon stopped")
+
+def run_fetch():
+    """`fetch` subcommand: fetch every feed and queue new matches for the next `send`"""
+    METRICS.reset()
+    try:
+        with METRICS.timer('total'):
+            ensure_monitor_config()
+            init_db()
+            load_seen_index()
+            try:
+                new = 0
+                for batch in iter_clustered_batches(iter_fetch_feeds(RSS_FEEDS)):
+                    queue_for_digest(batch)
+                    new += len(batch)
+                run_maintenance()
+                pending = count_pending_digest()
+            finally:
+                close_db()
+        print(f"\nNew articles: {new}, waiting for the next digest: {pending}")
+        print_run_stats()
+    finally:
+        write_metrics()
+
+def run_send():
+    """`send` subcommand: email the queued articles, then clear the queue"""
+    METRICS.reset()
+    try:
+        ensure_monitor_config()
+        init_db()
+        try:
+            up_to = last_pending_rowid()
+            print(f"Sending digest with {count_pending_digest()} articles")
+            deliver_digest(iter_pending_digest(up_to), feed_health_report(RSS_FEEDS))
+            clear_pending_digest(up_to)
+        finally:
+            close_db()
+    finally:
+        write_metrics()
+
+def run_render(args):
+    """`render` subcommand: write the digest of the queued articles without sending it"""
+    ensure_monitor_config()
+    open_db_readonly()
+    config = load_scoring_config()
+    try:
+        health = feed_health_report(RSS_FEEDS)
+        articles, totals = select_top_articles(score_articles(iter_pending_digest(), config),
+                                               DIGEST_TOP_N or config['top_n'],
+                                               DIGEST_PER_SOURCE or config['top_n_per_source'])
+    finally:
+        close_db()
+    render = iter_text_digest if args.text else iter_html_digest
+    chunks = render(articles, per_source=0, top_n=0, totals=totals, health=health)
+    if args.output == '-':
+        write_digest(chunks, sys.stdout)
+        return
+    with open(args.output, 'w', encoding='utf-8') as f:
+        write_digest(chunks, f)
+    print(f"✓ Digest of {len(articles)} queued articles saved to {args.output}")
+
+def _last_run_summary(path: str, tail_bytes: int = 256 * 1024) -> Optional[Dict]:
+    """Totals of the last run recorded in METRICS_JSONL (reads only the end of the file)"""
+    try:
+        with open(path, 'rb') as f:
+            start = max(0, f.seek(0, os.SEEK_END) - tail_bytes)
+            f.seek(start)
+            lines = f.read().decode('utf-8', 'replace').splitlines()
+    except OSError:
+        return None
+    if start:
+        lines = lines[1:]  # probably cut mid-line
+    samples = []
+    for line in lines:
+        try:
+            samples.append(json.loads(line))
+        except ValueError:
+            continue
+    if not samples:
+        return None
+    last_ts = samples[-1]['ts']
+    summary = {'ts': last_ts, 'seconds': 0.0, 'new_items': 0, 'emails_sent': 0, 'fetch_errors': 0,
+               'entries_parsed': 0, 'entries_skipped': 0}
+    for sample in samples:
+        if sample['ts'] != last_ts:
+            continue
+        if sample['metric'] == 'stage_seconds' and sample.get('stage') == 'total':
+            summary['seconds'] = sample['value']
+        elif sample['metric'] in summary:
+            summary[sample['metric']] += sample['value']
+    return summary
+
+def run_stats():
+    """`stats` subcommand: article history, queue and feed cache at a glance"""
+    ensure_monitor_config()
+    open_db_readonly()
+    try:
+        conn = get_db()
+        count, first, last = conn.execute("SELECT COUNT(*), MIN(seen_date), MAX(seen_date) FROM articles").fetchone()
+        (keys,) = conn.execute("SELECT COUNT(*) FROM seen_keys").fetchone()
+        by_source = conn.execute(
+            "SELECT source, COUNT(*), MAX(seen_date) FROM articles GROUP BY source ORDER BY 2 DESC").fetchall()
+        cached_feeds, last_checked = conn.execute("SELECT COUNT(*), MAX(checked_date) FROM feed_cache").fetchone()
+        pending = count_pending_digest()
+        exported_until = get_meta('export_watermark')
+        health = feed_health_report(RSS_FEEDS)
+    finally:
+        close_db()
+
+    print(f"Database: {DB_PATH} ({os.path.getsize(DB_PATH) / 1e6:.1f} MB)")
+    print(f"Articles: {count:,}" + (f" (first seen {first[:10]}, last {last[:10]})" if count else ""))
+    print(f"Dedup keys (incl. archived articles): {keys:,}")
+    print(f"Waiting for the next digest: {pending:,}")
+    print(f"Exported up to: {exported_until[:16] if exported_until else 'never'}")
+    print(f"Feeds with cached validators: {cached_feeds}" + (f" (last checked {last_checked[:16]})" if last_checked else ""))
+    if health['failing']:
+        print(f"\nFailing feeds ({len(health['failing'])} of {health['total']}):")
+        for feed in health['failing']:
+            print(f"  {feed['source']:<30}{feed['last_error'] or 'error'} ({_health_note(feed)})")
+    if by_source:
+        print("\nArticles by source:")
+        for source, n, latest in by_source:
+            print(f"  {source:<30}{n:>8,}   last {latest[:10]}")
+    last_run = _last_run_summary(METRICS_JSONL) if METRICS_JSONL else None
+    if last_run:
+        print(f"\nLast run {last_run['ts']}: {last_run['seconds']:.1f}s, {last_run['new_items']:.0f} new, "
+              f"{last_run['fetch_errors']:.0f} fetch errors, {last_run['emails_sent']:.0f} emails sent")
+        if last_run['entries_skipped']:
+            print(f"  {last_run['entries_skipped']:,.0f} of "
+                  f"{last_run['entries_skipped'] + last_run['entries_parsed']:,.0f} entries skipped early "
+                  f"(in the feed's previous fetch)")
+
+def run_search(args):
+    """`search` subcommand: print ranked matches from the article history"""
+    open_db_readonly()
+    try:
+        start = time.perf_counter()
+        results = search_articles(args.query, args.source, args.since, args.until, args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    except sqlite3.OperationalError as e:
+        print(f"Search failed: {e}")
+        return
+    finally:
+        close_db()
+
+    for i, r in enumerate(results, 1):
+        print(f"{i:>3}. [{r['seen_date'][:10]}] {r['source']}: {r['title']}")
+        print(f"     {r['link']}")
+        print(f"     {' '.join(r['snippet'].split())}")
+    print(f"\n{len(results)} results in {elapsed_ms:.1f} ms")
+
+def run_export(args):
+    """`export` subcommand: write articles seen since the last export to compressed chunks"""
+    init_db()
+    try:
+        start = time.perf_counter()
+        exported, files = export_articles(args.output_dir, args.format, args.chunk_rows, args.full)
+        elapsed = time.perf_counter() - start
+    finally:
+        close_db()
+    if not files:
+        print("Nothing new to export")
+        return
+    for path in files:
+        print(f"  {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"\n✓ Exported {exported:,} articles in {elapsed:.1f}s")
+
+def run_trends(args):
+    """`trends` subcommand: keyword hits (or article counts) per period and source from daily_rollup"""
+    ensure_monitor_config()  # the rollup is brought up to date first
+    init_db()
+    try:
+        update_rollup()
+        since = args.since or (datetime.now() - timedelta(weeks=args.weeks)).strftime('%Y-%m-%d')
+        start = time.perf_counter()
+        rows = keyword_trends(args.keywords, args.source, since, args.period)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        close_db()
+
+    if not rows:
+        print(f"No {'matches' if args.keywords else 'articles'} since {since}")
+        return
+    label = 'keyword' if args.keywords else ''
+    print(f"{args.period:<12}{'source':<30}{label:<30}{'hits':>8}")
+    for period, source, keyword, hits in rows:
+        print(f"{period:<12}{source:<30}{keyword:<30}{hits:>8,}")
+    print(f"\n{len(rows)} rows in {elapsed_ms:.1f} ms")
+
+FEED_FILE_EXTENSIONS = ('.xml', '.rss', '.atom')
+
+def iter_opml_feeds(path: str) -> Iterator[Tuple[str, str]]:
+    """(name, feed URL) for every outline with an xmlUrl in an OPML file"""
+    import xml.etree.ElementTree as ET
+
+    for _, element in ET.iterparse(path):
+        if _local_name(element.tag) == 'outline' and element.get('xmlUrl'):
+            url = element.get('xmlUrl')
+            yield element.get('title') or element.get('text') or url, url
+
+def iter_import_sources(paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """(source name, file path or URL) for OPML files, directories of feed files and single feed files"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(FEED_FILE_EXTENSIONS):
+                    yield os.path.splitext(name)[0], os.path.join(path, name)
+        elif path.lower().endswith('.opml'):
+            yield from iter_opml_feeds(path)
+        else:
+            yield os.path.splitext(os.path.basename(path))[0], path
+
+def iter_import_entries(location: str) -> Iterator[Dict]:
+    """Stream entries from a feed file, or from a feed URL (downloaded first)"""
+    if urlsplit(location).scheme in ('http', 'https'):
+        data, headers = download_feed(location)
+        return iter_entries(io.BytesIO(data), headers.get('content-location', location))
+    return iter_entries(location)
+
+def run_import(args):
+    """`import` subcommand: backfill history from OPML feed lists or saved feed files.
+
+    Every stage is a generator: entries are parsed one at a time, matched,
+    deduplicated and stored in STREAM_BATCH batches, and only the best
+    --top articles are kept for the digest, so memory stays flat for any
+    number of entries. With PARSE_PROCESSES set, several files are parsed
+    and matched at once on worker processes (holding each file's matches,
+    not its entries), while this process remains the only DB writer.
+    """
+    import xml.etree.ElementTree as ET
+
+    METRICS.reset()
+    ensure_monitor_config()
+    init_db()
+    load_seen_index()
+
+    def new_articles():
+        for name, location in iter_import_sources(args.paths):
+            source = args.source or name
+            print(f"Importing {source} from {location}...")
+            try:
+                yield from iter_new_articles(iter_matches(source, iter_import_entries(location)))
+            except (OSError, ET.ParseError) as e:
+                print(f"  Error importing {location}: {e}")
+                METRICS.incr('fetch_errors', feed=source)
+
+    def new_articles_in_pool(pool):
+        # Files are parsed and matched in parallel, a few ahead of the single writer
+        in_flight = deque()
+        sources = iter_import_sources(args.paths)
+        while True:
+            while len(in_flight) < 2 * PARSE_PROCESSES:
+                name, location = next(sources, (None, None))
+                if location is None:
+                    break
+                source = args.source or name
+                in_flight.append((source, location, pool.submit(_import_task, source, location)))
+            if not in_flight:
+                return
+            source, location, future = in_flight.popleft()
+            print(f"Importing {source} from {location}...")
+            try:
+                candidates = _expand_candidates(source, future.result())
+            except (OSError, ET.ParseError) as e:
+                print(f"  Error importing {location}: {e}")
+                METRICS.incr('fetch_errors', feed=source)
+                continue
+            yield from iter_new_articles(candidates)
+
+    pool = get_parse_pool()
+    try:
+        articles, totals = select_top_articles(
+            score_articles(new_articles_in_pool(pool) if pool else new_articles(), load_scoring_config()),
+            args.top, args.per_source)
+    finally:
+        close_db()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        write_digest(iter_html_digest(articles, per_source=0, top_n=0, totals=totals), f)
+    print(f"\nEntries read: {METRICS.total('entries_parsed'):,.0f}, matched: {METRICS.total('matches'):,.0f}, "
+          f"new: {sum(totals.values()):,}")
+    print(f"✓ Digest of the top {len(articles)} saved to {args.output}")
+
+def main(argv: List[str] = None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Defence & Security News Monitor")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running, polling each feed on an adaptive schedule")
+    parser.add_argument('--digest-at', default=os.environ.get('DIGEST_AT', '06:00'),
+                        help="daemon: comma-separated HH:MM times to send the digest (default 06:00)")
+    parser.add_argument('--digest-threshold', type=int, default=int(os.environ.get('DIGEST_THRESHOLD', '0')),
+                        help="daemon: also send as soon as this many matches are waiting (0 = off)")
+    commands = parser.add_subparsers(dest='command', metavar='command',
+                                     help="default: fetch, then send (the daily run)")
+    commands.add_parser('fetch', help="fetch all feeds and queue new matches, without sending")
+    render = commands.add_parser('render', help="write the digest of the queued matches, without sending")
+    render.add_argument('--output', default='latest_digest.html', help="file to write, or - for stdout")
+    render.add_argument('--text', action='store_true', help="plain text instead of HTML")
+    commands.add_parser('send', help="email the queued matches to all subscribers and clear the queue")
+    commands.add_parser('stats', help="article history, queue and feed cache statistics")
+    search = commands.add_parser('search', help="full-text search over the article history")
+    search.add_argument('query', help='FTS5 query, e.g. AUKUS, "digital twin", AUKUS AND submarine, drone NOT China')
+    search.add_argument('--source', help="only this feed (exact name, e.g. 'Defense News')")
+    search.add_argument('--since', help="first seen on or after this date (YYYY-MM-DD)")
+    search.add_argument('--until', help="first seen before this date (YYYY-MM-DD)")
+    search.add_argument('--limit', type=int, default=20)
+    export = commands.add_parser('export', help="write articles seen since the last export to compressed files")
+    export.add_argument('--format', default='jsonl', choices=['jsonl', 'csv'])
+    export.add_argument('--output-dir', default=EXPORT_DIR, help=f"where to write the chunks (default {EXPORT_DIR}/)")
+    export.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS, help="rows per file")
+    export.add_argument('--full', action='store_true', help="export everything, ignoring the last export")
+    trends = commands.add_parser('trends', help="keyword hits per week (or day/month) and source")
+    trends.add_argument('keywords', nargs='*', help="keywords to count (default: all articles per source)")
+    trends.add_argument('--source', help="only this feed (exact name)")
+    trends.add_argument('--period', default='week', choices=list(TREND_PERIODS))
+    trends.add_argument('--weeks', type=int, default=12, help="how far back to look (default 12)")
+    trends.add_argument('--since', help="start date (YYYY-MM-DD), instead of --weeks")
+    backfill = commands.add_parser('import', help="backfill from OPML feed lists, feed files or directories of them")
+    backfill.add_argument('paths', nargs='+', help="*.opml files, feed files (.xml/.rss/.atom) or directories")
+    backfill.add_argument('--source', help="source name for every imported entry (default: file or outline name)")
+    backfill.add_argument('--top', type=int, default=100, help="articles kept for the digest (default 100)")
+    backfill.add_argument('--per-source', type=int, default=0, help="articles kept per source (0 = no limit)")
+    backfill.add_argument('--output', default='import_digest.html', help="where to write the digest")
+    args = parser.parse_args(argv)
+
+    if args.command not in ('search', 'export'):
+        try:
+            ensure_monitor_config()
+        except (OSError, ValueError, KeyError) as e:
+            parser.exit(1, f"Could not load {MONITOR_CONFIG}: {e!r}\n")
+
+    if args.command == 'search':
+        run_search(args)
+        return
+    if args.command == 'stats':
+        run_stats()
+        return
+    if args.command == 'render':
+        run_render(args)
+        return
+    if args.command == 'export':
+        run_export(args)
+        return
+    if args.command == 'trends':
+        run_trends(args)
+        return
+
+    with profiling():
+        if args.command == 'fetch':
+            run_fetch()
+        elif args.command == 'send':
+            run_send()
+        elif args.command == 'import':
+            run_import(args)
+        elif args.daemon:
+            run_daemon(_parse_digest_times(args.digest_at), args.digest_threshold)
+        else:
+            run_once()
+
 if __name__ == "__main__":
     main()